@@ -0,0 +1,47 @@
+import hashlib
+from telegram.error import BadRequest
+
+class AssetRegistry:
+    """Static assets uploaded to Telegram once and reused by file_id"""
+
+    def __init__(self, db):
+        self.db = db
+        self.hashes = {}  # asset path -> content hash
+        self.file_ids = {}  # content hash -> Telegram file_id
+
+    def get_hash(self, path: str) -> str:
+        """Get the SHA-256 of an asset file (read once per process)"""
+        if path not in self.hashes:
+            with open(path, 'rb') as f:
+                self.hashes[path] = hashlib.sha256(f.read()).hexdigest()
+        return self.hashes[path]
+
+    def get_file_id(self, content_hash: str):
+        """Get the cached file_id for an asset, if it was uploaded before"""
+        if content_hash not in self.file_ids:
+            file_id = self.db.get_asset_file_id(content_hash)
+            if not file_id:
+                return None
+            self.file_ids[content_hash] = file_id
+        return self.file_ids[content_hash]
+
+    async def send_photo(self, send, path: str, **kwargs):
+        """Send a static photo with `send` (e.g. reply_photo), uploading the file only when needed"""
+        content_hash = self.get_hash(path)
+
+        file_id = self.get_file_id(content_hash)
+        if file_id:
+            try:
+                return await send(photo=file_id, **kwargs)
+            except BadRequest as e:
+                # Telegram no longer accepts the file_id - upload the file again
+                print(f"Cached file_id for {path} rejected: {e}")
+                self.file_ids.pop(content_hash, None)
+
+        with open(path, 'rb') as photo:
+            message = await send(photo=photo, **kwargs)
+
+        file_id = message.photo[-1].file_id
+        self.db.save_asset_file_id(content_hash, path, file_id)
+        self.file_ids[content_hash] = file_id
+        return message
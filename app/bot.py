@@ -1,7 +1,9 @@
 import logging
+from datetime import timedelta
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters
 from telegram import BotCommand
 from handlers import BotHandlers
+from digest import DigestJob
 from config import Config
 
 # Configure logging
@@ -11,8 +13,35 @@ logging.basicConfig(
 )
 
 async def post_init(application):
-    """Clear bot commands menu"""
+    """Clear bot commands menu and start the outbound send queue"""
     await application.bot.set_my_commands([])
+    await application.bot_data['handlers'].sender.start(application.bot)
+
+async def post_shutdown(application):
+    """Flush and stop the outbound send queue"""
+    await application.bot_data['handlers'].sender.stop()
+
+async def create_partitions(context):
+    """Job callback: make sure upcoming monthly transactions partitions exist"""
+    created = context.bot_data['handlers'].db.ensure_transactions_partitions(Config.PARTITION_MONTHS_AHEAD)
+    if created:
+        print(f"Created {created} transactions partitions")
+
+async def prune_transaction_requests(context):
+    """Job callback: delete old transaction idempotency keys"""
+    context.bot_data['handlers'].db.delete_old_transaction_requests(Config.TRANSACTION_REQUESTS_RETENTION_DAYS)
+
+async def reconvert_fallback_transactions(context):
+    """Job callback: fetch real rates for transactions converted with snapshot rates and re-convert them"""
+    handlers = context.bot_data['handlers']
+    db = handlers.db
+    for missing_date in db.get_fallback_rate_dates():
+        if not await handlers.refresh_usd_rates(missing_date):
+            # Rate sources are still down; try again on the next run
+            return
+    reconverted = db.reconvert_fallback_transactions()
+    if reconverted:
+        print(f"Re-converted {reconverted} transactions saved with fallback rates")
 
 def main():
     """Main function to run the bot"""
@@ -20,17 +49,40 @@ def main():
     handlers = BotHandlers()
 
     # Build the application
-    app = ApplicationBuilder().token(Config.BOT_TOKEN).post_init(post_init).build()
+    app = ApplicationBuilder().token(Config.BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
+    app.bot_data['handlers'] = handlers
 
     # Add command handlers
     app.add_handler(CommandHandler('start', handlers.start_command))
     app.add_handler(CommandHandler('help', handlers.help_command))
     app.add_handler(CommandHandler('summarize', handlers.summarize_command))
+    app.add_handler(CommandHandler('digest', handlers.digest_command))
+    app.add_handler(CommandHandler('categories', handlers.categories_command))
+    app.add_handler(CommandHandler('addcategory', handlers.add_category_command))
+    app.add_handler(CommandHandler('debug_queue', handlers.debug_queue_command))
+    app.add_handler(CommandHandler('debug_queries', handlers.debug_queries_command))
+    app.add_handler(CommandHandler('debug_memory', handlers.debug_memory_command))
 
     # Add message and callback handlers
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_message))
     app.add_handler(CallbackQueryHandler(handlers.handle_callback_query))
 
+    # Create upcoming transactions partitions at startup and then daily
+    app.job_queue.run_repeating(create_partitions, interval=timedelta(days=1), first=0, name="create_partitions")
+    app.job_queue.run_repeating(prune_transaction_requests, interval=timedelta(days=1), first=60, name="prune_transaction_requests")
+    app.job_queue.run_repeating(
+        reconvert_fallback_transactions,
+        interval=timedelta(minutes=Config.RATE_RECONVERT_MINUTES),
+        first=120,
+        name="reconvert_fallback_transactions"
+    )
+
+    # Schedule periodic digests (weekly on Mondays, monthly on the 1st) and resume interrupted runs
+    digest_job = DigestJob(handlers.db, handlers.chart_generator, handlers.sender, handlers.memory_governor)
+    app.job_queue.run_daily(digest_job.run, time=Config.DIGEST_TIME, days=(1,), data="weekly", name="weekly_digest")
+    app.job_queue.run_monthly(digest_job.run, when=Config.DIGEST_TIME, day=1, data="monthly", name="monthly_digest")
+    app.job_queue.run_once(digest_job.resume, when=10, name="digest_resume")
+
     # Start the bot
     print("🤖 Bot is starting...")
     app.run_polling()
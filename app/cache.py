@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Bounded in-memory mapping whose entries expire after a fixed time"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), oldest first
+
+    def purge(self):
+        """Drop expired entries, then the oldest ones beyond max_size"""
+        now = time.monotonic()
+        while self.entries:
+            key, (expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_size:
+                break
+            self.entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Get a value if present and not expired"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key, value=True):
+        """Store a value, (re)starting its TTL"""
+        self.entries.pop(key, None)
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.purge()
+
+    def add(self, key) -> bool:
+        """Add a key unless it is already present; returns False for duplicates"""
+        if key in self:
+            return False
+        self.set(key)
+        return True
+
+    def pop(self, key, default=None):
+        """Remove a key and return its value if it was present and not expired"""
+        entry = self.entries.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, self) is not self
+
+    def __len__(self) -> int:
+        self.purge()
+        return len(self.entries)
@@ -1,5 +1,5 @@
-import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+from matplotlib.figure import Figure
 import io
 
 class ChartGenerator:
@@ -20,13 +20,12 @@ class ChartGenerator:
             '#98D8C8'   # Pearl Aqua
         ]
 
-    def create_spending_chart(self, categories: list, amounts: list, currency: str, period_title: str):
+    def create_spending_chart(self, categories: list, amounts: list, currency: str, period_title: str,
+                              figsize: tuple = (12, 8), dpi: int = 150):
         """Create a modern donut chart for spending summary"""
-        # Use default style with white background
-        plt.style.use('default')
-
-        # Create figure with better proportions
-        fig, ax = plt.subplots(figsize=(12, 8))
+        # Use the Figure API instead of pyplot so charts can be rendered from worker threads
+        fig = Figure(figsize=figsize)
+        ax = fig.subplots()
         fig.patch.set_facecolor('#F8F9FA')  # Light gray background
         ax.set_facecolor('#F8F9FA')
 
@@ -49,7 +48,7 @@ class ChartGenerator:
         )
 
         # Make it a donut by adding white circle in center
-        centre_circle = plt.Circle((0, 0), 0.55, fc='#F8F9FA', linewidth=0)
+        centre_circle = mpatches.Circle((0, 0), 0.55, fc='#F8F9FA', linewidth=0)
         ax.add_artist(centre_circle)
 
         # Add total in the center
@@ -99,20 +98,19 @@ class ChartGenerator:
         ax.axis('equal')
 
         # Adjust layout to prevent legend cutoff
-        plt.tight_layout()
+        fig.tight_layout()
 
         # Save the chart to a bytes buffer with high quality
         buf = io.BytesIO()
-        plt.savefig(
+        fig.savefig(
             buf,
             format='png',
             bbox_inches='tight',
-            dpi=150,
+            dpi=dpi,
             facecolor='#F8F9FA',
             edgecolor='none',
             pad_inches=0.5
         )
         buf.seek(0)
-        plt.close()
 
         return buf 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from datetime import time, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,10 +13,70 @@ class Config:
     DB_NAME = os.getenv('POSTGRES_DB', 'postgres')
     DB_USER = os.getenv('POSTGRES_USER', 'postgres')
     DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'postgres')
+    # Optional read replica (libpq DSN/URL) for read-only queries; unset = everything goes to the primary
+    DB_READ_DSN = os.getenv('POSTGRES_READ_DSN')
+    # After a user's own write, their reads stay on the primary for this long (covers replica lag)
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+    # An unreachable replica is skipped (reads go to the primary) for this long before reconnecting
+    READ_REPLICA_CONNECT_TIMEOUT = int(os.getenv('READ_REPLICA_CONNECT_TIMEOUT', 3))
+    READ_REPLICA_RETRY_SECONDS = int(os.getenv('READ_REPLICA_RETRY_SECONDS', 60))
+    # Server-side prepared statements (opt-in): PREPARE and EXECUTE may land on different backends
+    # behind a transaction-mode pooler (e.g. Supabase port 6543), so only enable on direct/session connections
+    DB_PREPARE_STATEMENTS = os.getenv('POSTGRES_PREPARE_STATEMENTS', 'false').lower() == 'true'
+    # Server-side (WITH HOLD) cursors for streamed reads; same restriction as prepared statements
+    DB_SERVER_CURSORS = os.getenv('POSTGRES_SERVER_CURSORS', 'false').lower() == 'true'
     
     # Bot configuration
     BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     
+    # Telegram flood limits (messages per second)
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+    TELEGRAM_PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', 1))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 3))
+    SEND_QUEUE_WORKERS = int(os.getenv('SEND_QUEUE_WORKERS', 4))
+    
+    # Telegram user IDs allowed to use /debug_* commands (comma-separated)
+    ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+    
+    # Monthly transactions partitions created in advance
+    PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+    
+    # Duplicate update/callback detection
+    PROCESSED_UPDATES_TTL_SECONDS = int(os.getenv('PROCESSED_UPDATES_TTL_SECONDS', 600))
+    DUPLICATE_CALLBACK_SECONDS = int(os.getenv('DUPLICATE_CALLBACK_SECONDS', 10))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000))
+    TRANSACTION_REQUESTS_RETENTION_DAYS = int(os.getenv('TRANSACTION_REQUESTS_RETENTION_DAYS', 7))
+    
+    # Memory governor (fly.toml gives the VM 512 MB); MEMORY_BUDGET_MB=0 disables it
+    MEMORY_BUDGET_MB = int(os.getenv('MEMORY_BUDGET_MB', 400))
+    CHART_RENDER_WORKERS = int(os.getenv('CHART_RENDER_WORKERS', 2))
+    TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', 1))
+    PENDING_INPUT_TTL_SECONDS = int(os.getenv('PENDING_INPUT_TTL_SECONDS', 3600))
+    DB_FETCH_BATCH_SIZE = int(os.getenv('DB_FETCH_BATCH_SIZE', 1000))
+    
+    # Currency rate sources, queried concurrently (first good response wins);
+    # {version} is replaced with "latest" or a YYYY-MM-DD date
+    RATE_SOURCE_URLS = [url.strip() for url in os.getenv(
+        'RATE_SOURCE_URLS',
+        'https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@{version}/v1/currencies/usd.json,'
+        'https://{version}.currency-api.pages.dev/v1/currencies/usd.json'
+    ).split(',') if url.strip()]
+    RATE_SOURCE_TIMEOUT_SECONDS = float(os.getenv('RATE_SOURCE_TIMEOUT_SECONDS', 5))
+    # After all sources failed, use the snapshot without retrying them for this long
+    RATE_SOURCE_RETRY_SECONDS = int(os.getenv('RATE_SOURCE_RETRY_SECONDS', 300))
+    # Last-resort rates; transactions converted with them are re-converted later
+    RATE_SNAPSHOT_FILE = 'data/usd_rates_snapshot.json'
+    RATE_RECONVERT_MINUTES = int(os.getenv('RATE_RECONVERT_MINUTES', 30))
+
+    # Periodic digest configuration
+    DIGEST_TIME = time(hour=int(os.getenv('DIGEST_HOUR_UTC', 9)), tzinfo=timezone.utc)
+    # Passes over users whose digest failed transiently before the run is left for resume after a restart
+    DIGEST_MAX_ATTEMPTS = int(os.getenv('DIGEST_MAX_ATTEMPTS', 3))
+    DIGEST_RETRY_SECONDS = int(os.getenv('DIGEST_RETRY_SECONDS', 300))
+    
+    # Static assets
+    WELCOME_IMAGE = 'images/welcome.png'
+    
     # Help text constant
     HELP_TEXT = """
 🤖 How to add transactions: 🤖
@@ -24,8 +85,14 @@ Simply send a message with amount and currency, for example:
 "100" - as simple as possible, we'll use your default currency {currency}
 "25 USD" - you can specify currency if needed (use three-letter currency code)
 "15 USD coffee" - you can add any text to describe your spends
+
+🗂 Use /categories to rename or archive categories, /addcategory <name> to add one
+📬 Use /digest to get a weekly or monthly spending summary
 """
     
+    # Must fit categories.category_name VARCHAR(100)
+    MAX_CATEGORY_NAME_LENGTH = 100
+    
     # Default categories
     DEFAULT_CATEGORIES = [
         "Groceries",
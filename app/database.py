@@ -1,17 +1,33 @@
 import psycopg2
-import requests
+import psycopg2.errors
+import time
+from itertools import count
 from datetime import date
 from config import Config
+from queries import QueryRegistry
+from rates import RateProvider
 
 class Database:
     """Database connection and operations class"""
     
+    # Drop expired read-your-writes entries once this many users are tracked
+    MAX_RECENT_WRITES = 10000
+
     def __init__(self):
         self.connection = None
+        self.read_connection = None  # Read replica connection, if POSTGRES_READ_DSN is set
+        self.replica_down_until = 0.0  # The replica is skipped until then after it failed
+        self.recent_writes = {}  # user ID -> time of the user's last write
+        self.cursor_ids = count()  # Unique names for server-side cursors
+        self.queries = QueryRegistry()
+        self.rates = RateProvider()
         self.connect()
     
     def connect(self):
         """Establish database connection"""
+        # Statements prepared on the old connection are gone with it
+        if self.connection:
+            self.queries.forget(self.connection)
         try:
             self.connection = psycopg2.connect(
                 dbname=Config.DB_NAME,
@@ -24,145 +40,376 @@ class Database:
             print(f"Database connection failed: {e}")
             raise
     
-    def get_cursor(self):
-        """Get a database cursor"""
+    def get_connection(self):
+        """Get the primary connection, reconnecting if it was closed"""
         if not self.connection or self.connection.closed:
             self.connect()
-        return self.connection.cursor()
+        return self.connection
     
-    def initialize_user_categories(self, user_id: int):
-        """Initialize default categories for a new user"""
-        with self.get_cursor() as cur:
-            for category in Config.DEFAULT_CATEGORIES:
-                cur.execute(
+    def get_cursor(self):
+        """Get a database cursor"""
+        return self.get_connection().cursor()
+    
+    def connect_read(self):
+        """Establish read replica connection"""
+        if self.read_connection:
+            self.queries.forget(self.read_connection)
+        self.read_connection = psycopg2.connect(Config.DB_READ_DSN, connect_timeout=Config.READ_REPLICA_CONNECT_TIMEOUT)
+        # Autocommit, so reads don't hold a transaction (and an old snapshot) open on the replica
+        self.read_connection.set_session(readonly=True, autocommit=True)
+    
+    def get_read_connection(self, user_id: int = None):
+        """Get the connection for read-only queries: the replica, unless the user wrote recently"""
+        if Config.DB_READ_DSN and not self.wrote_recently(user_id) and time.monotonic() >= self.replica_down_until:
+            try:
+                if not self.read_connection or self.read_connection.closed:
+                    self.connect_read()
+                return self.read_connection
+            except Exception as e:
+                print(f"Read replica unavailable, using primary for {Config.READ_REPLICA_RETRY_SECONDS}s: {e}")
+                # Connecting blocks the event loop, so don't retry on every read while the replica is down
+                self.replica_down_until = time.monotonic() + Config.READ_REPLICA_RETRY_SECONDS
+        return self.get_connection()
+    
+    def drop_read_connection(self):
+        """Close a failed replica connection; reads reconnect after the retry window"""
+        if self.read_connection:
+            self.queries.forget(self.read_connection)
+            if not self.read_connection.closed:
+                self.read_connection.close()
+        self.read_connection = None
+        self.replica_down_until = time.monotonic() + Config.READ_REPLICA_RETRY_SECONDS
+    
+    def open_read_cursor(self, connection, name: str, sql: str, params: tuple, stream: bool = False):
+        """Open a cursor on a connection and run a read-only query on it"""
+        server_cursor = stream and Config.DB_SERVER_CURSORS
+        if server_cursor:
+            # WITH HOLD keeps the cursor open across commits/rollbacks of other work on the connection,
+            # but every FETCH must reach the same backend: needs a direct or session-mode connection
+            cur = connection.cursor(name=f"{name}_{next(self.cursor_ids)}", withhold=True)
+        else:
+            # Client-side cursor: a streamed result arrives at once, but rows are still built batch by batch
+            cur = connection.cursor()
+        try:
+            # A named cursor sends DECLARE ... CURSOR FOR, which can't wrap EXECUTE, so only it skips
+            # prepared statements; client-side streamed reads are prepared like any other query
+            self.queries.execute(cur, name, sql, params, readonly=True, prepare=not server_cursor)
+            return cur
+        except Exception:
+            cur.close()
+            raise
+    
+    def execute_read(self, name: str, sql: str, params: tuple, user_id: int = None, stream: bool = False):
+        """Run a read-only query and return its cursor; if the replica fails, it is dropped and the query retried on the primary"""
+        connection = self.get_read_connection(user_id)
+        try:
+            return self.open_read_cursor(connection, name, sql, params, stream)
+        except psycopg2.OperationalError as e:
+            if connection is not self.read_connection:
+                raise
+            print(f"Read replica failed, retrying on primary: {e}")
+            self.drop_read_connection()
+            return self.open_read_cursor(self.get_connection(), name, sql, params, stream)
+    
+    def stream_read(self, name: str, sql: str, params: tuple, user_id: int = None, use_replica: bool = True):
+        """Yield rows of a read-only query in batches of DB_FETCH_BATCH_SIZE, instead of fetchall()"""
+        if use_replica:
+            cur = self.execute_read(name, sql, params, user_id, stream=True)
+        else:
+            cur = self.open_read_cursor(self.get_connection(), name, sql, params, stream=True)
+        try:
+            if not cur.connection.autocommit:
+                cur.connection.commit()
+            # A replica failing after the first rows can't be retried without repeating them
+            while True:
+                rows = cur.fetchmany(Config.DB_FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+    
+    def mark_write(self, user_id: int):
+        """Remember that a user just wrote, so their reads go to the primary for a while"""
+        now = time.monotonic()
+        if len(self.recent_writes) >= self.MAX_RECENT_WRITES:
+            self.recent_writes = {
+                key: written_at for key, written_at in self.recent_writes.items()
+                if now - written_at < Config.READ_YOUR_WRITES_SECONDS
+            }
+        self.recent_writes[user_id] = now
+    
+    def wrote_recently(self, user_id: int) -> bool:
+        """Check if a user wrote within the read-your-writes window (replica may lag behind)"""
+        written_at = self.recent_writes.get(user_id)
+        return written_at is not None and time.monotonic() - written_at < Config.READ_YOUR_WRITES_SECONDS
+    
+    def insert_categories(self, cur, user_id: int, category_names: list, restore_archived: bool = False):
+        """Insert several categories for a user with a single statement, skipping existing ones"""
+        insert_sql = """
+            INSERT INTO categories (user_id, category_name)
+            SELECT %s::bigint, name FROM unnest(%s::text[]) WITH ORDINALITY AS names(name, position)
+            ORDER BY position
+            ON CONFLICT (user_id, category_name)
+            """
+        if restore_archived:
+            self.queries.execute(
+                cur,
+                "insert_or_restore_categories",
+                insert_sql + "DO UPDATE SET archived_at = NULL RETURNING id",
+                (user_id, category_names)
+            )
+        else:
+            self.queries.execute(
+                cur,
+                "insert_categories",
+                insert_sql + "DO NOTHING RETURNING id",
+                (user_id, category_names)
+            )
+        return [row[0] for row in cur.fetchall()]
+
+    def onboard_user(self, user_id: int, currency: str) -> bool:
+        """Create a user with the selected currency and default categories in one transaction;
+        returns False (changing nothing) if the user already exists"""
+        try:
+            with self.get_cursor() as cur:
+                # Never change an existing user's currency: their past amounts are converted to it
+                self.queries.execute(
+                    cur,
+                    "insert_onboarded_user",
                     """
-                    INSERT INTO categories (category_name, user_id)
-                    SELECT %s, %s
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM categories WHERE category_name = %s AND user_id = %s
-                    )
+                    INSERT INTO users (user_id, currency, categories_initialized)
+                    VALUES (%s, %s, TRUE)
+                    ON CONFLICT (user_id) DO NOTHING
+                    RETURNING user_id
                     """,
-                    (category, user_id, category, user_id)
+                    (user_id, currency)
                 )
+                created = cur.fetchone() is not None
+                if created:
+                    self.insert_categories(cur, user_id, Config.DEFAULT_CATEGORIES)
             self.connection.commit()
-    
+            self.mark_write(user_id)
+            return created
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def initialize_user_categories(self, user_id: int):
+        """Initialize default categories for an existing user that has none yet"""
+        try:
+            with self.get_cursor() as cur:
+                self.insert_categories(cur, user_id, Config.DEFAULT_CATEGORIES)
+                self.queries.execute(
+                    cur,
+                    "mark_categories_initialized",
+                    "UPDATE users SET categories_initialized = TRUE WHERE user_id = %s",
+                    (user_id,)
+                )
+            self.connection.commit()
+            self.mark_write(user_id)
+        except Exception:
+            self.connection.rollback()
+            raise
+
     def get_user_categories(self, user_id: int):
-        """Get all categories for a user"""
+        """Get all active (not archived) categories for a user"""
+        with self.execute_read(
+            "user_categories",
+            "SELECT id, category_name FROM categories WHERE user_id = %s AND archived_at IS NULL ORDER BY id",
+            (user_id,),
+            user_id
+        ) as cur:
+            return cur.fetchall()
+
+    def add_user_category(self, user_id: int, category_name: str) -> int:
+        """Add a category for a user (restoring it if archived) and return its ID"""
+        with self.get_cursor() as cur:
+            category_id = self.insert_categories(cur, user_id, [category_name], restore_archived=True)[0]
+            self.connection.commit()
+            self.mark_write(user_id)
+            return category_id
+
+    def rename_user_category(self, user_id: int, category_id: int, category_name: str) -> bool:
+        """Rename a user's category; returns False if the user already has a category with that name"""
+        try:
+            with self.get_cursor() as cur:
+                self.queries.execute(
+                    cur,
+                    "rename_category",
+                    "UPDATE categories SET category_name = %s WHERE id = %s AND user_id = %s",
+                    (category_name, category_id, user_id)
+                )
+            self.connection.commit()
+            self.mark_write(user_id)
+            return True
+        except psycopg2.errors.UniqueViolation:
+            self.connection.rollback()
+            return False
+
+    def archive_user_category(self, user_id: int, category_id: int):
+        """Archive a user's category so it is no longer offered for new transactions"""
         with self.get_cursor() as cur:
-            cur.execute(
-                "SELECT id, category_name FROM categories WHERE user_id = %s ORDER BY id",
-                (user_id,)
+            self.queries.execute(
+                cur,
+                "archive_category",
+                "UPDATE categories SET archived_at = CURRENT_TIMESTAMP WHERE id = %s AND user_id = %s",
+                (category_id, user_id)
             )
-            return cur.fetchall()
+            self.connection.commit()
+            self.mark_write(user_id)
     
-    def get_category_name(self, category_id: int):
-        """Get category name by ID"""
-        with self.get_cursor() as cur:
-            cur.execute("SELECT category_name FROM categories WHERE id = %s", (category_id,))
+    def get_category_name(self, category_id: int, user_id: int = None):
+        """Get category name by ID (user_id routes the read for read-your-writes)"""
+        with self.execute_read(
+            "category_name",
+            "SELECT category_name FROM categories WHERE id = %s",
+            (category_id,),
+            user_id
+        ) as cur:
             row = cur.fetchone()
             return row[0] if row else "Unknown"
     
-    def save_transaction(self, user_id: int, amount: str, currency: str, message: str, category_id: int) -> int:
-        """Save a new transaction and return its ID"""
+    def save_transaction(self, user_id: int, amount: str, currency: str, message: str, category_id: int, request_key: str) -> int:
+        """Save a new transaction and return its ID (the existing ID if request_key was already used)"""
         # Get user's default currency
         user_default_currency = self.get_user_currency(user_id)
 
         # Calculate default currency amount
+        rate_is_fallback = False
         if currency.upper() == user_default_currency:
             # If transaction currency is the same as user's default currency, use the same amount
             default_currency_amount = amount
         else:
-            # Convert to user's default currency using API rates
-            conversion_rate = self.get_conversion_rate(currency, user_default_currency)
+            # Convert to user's default currency using API rates (snapshot rates are flagged for re-conversion)
+            conversion_rate, rate_is_fallback = self.get_conversion_rate(currency, user_default_currency)
             default_currency_amount = float(amount) * conversion_rate
 
         with self.get_cursor() as cur:
-            cur.execute(
+            # The request key claims the transaction ID; a duplicate key inserts nothing
+            self.queries.execute(
+                cur,
+                "insert_transaction",
                 """
-                INSERT INTO transactions (user_id, amount, currency, message, category_id, timestamp, default_currency_amount)
-                VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, %s)
+                WITH claim AS (
+                    INSERT INTO transaction_requests (request_key, transaction_id)
+                    VALUES (%s, nextval('transactions_transaction_id_seq'))
+                    ON CONFLICT (request_key) DO NOTHING
+                    RETURNING transaction_id
+                )
+                INSERT INTO transactions (transaction_id, user_id, amount, currency, message, category_id, timestamp, default_currency_amount, rate_is_fallback)
+                SELECT transaction_id, %s::bigint, %s::numeric, %s::text, %s::text, %s::bigint, CURRENT_TIMESTAMP, %s::numeric, %s::boolean
+                FROM claim
                 RETURNING transaction_id
                 """,
-                (user_id, amount, currency, message, category_id, default_currency_amount)
+                (request_key, user_id, amount, currency, message, category_id, default_currency_amount, rate_is_fallback)
             )
-            transaction_id = cur.fetchone()[0]
+            row = cur.fetchone()
+            if row is None:
+                self.queries.execute(
+                    cur,
+                    "requested_transaction_id",
+                    "SELECT transaction_id FROM transaction_requests WHERE request_key = %s",
+                    (request_key,),
+                    readonly=True
+                )
+                row = cur.fetchone()
             self.connection.commit()
-            return transaction_id
+            self.mark_write(user_id)
+            return row[0]
     
     def get_user_transactions(self, user_id: int):
-        """Get all transactions for a user"""
-        with self.get_cursor() as cur:
-            cur.execute(
-                """
-                SELECT t.amount, t.currency, t.message, c.category_name, t.timestamp, t.default_currency_amount
-                FROM transactions t
-                LEFT JOIN categories c ON t.category_id = c.id
-                WHERE t.user_id = %s
-                ORDER BY t.transaction_id
-                """,
-                (user_id,)
-            )
-            return cur.fetchall()
+        """Yield all transactions for a user"""
+        return self.stream_read(
+            "user_transactions",
+            """
+            SELECT t.amount, t.currency, t.message, c.category_name, t.timestamp, t.default_currency_amount
+            FROM transactions t
+            LEFT JOIN categories c ON t.category_id = c.id
+            WHERE t.user_id = %s
+            ORDER BY t.transaction_id
+            """,
+            (user_id,),
+            user_id
+        )
     
-    def get_transactions_summary(self, user_id: int, time_condition: str = ""):
-        """Get transaction summary for a user with optional time filter using default currency amounts"""
-        with self.get_cursor() as cur:
-            cur.execute(
-                f"""
+    def get_transactions_summary(self, user_id: int, since: date = None):
+        """Get transaction summary for a user (optionally only since a date) using default currency amounts"""
+        summary_sql = """
                 SELECT c.category_name, SUM(t.default_currency_amount) as total_amount, u.currency as default_currency
                 FROM transactions t
                 LEFT JOIN categories c ON t.category_id = c.id
                 LEFT JOIN users u ON t.user_id = u.user_id
-                WHERE t.user_id = %s {time_condition}
+                WHERE t.user_id = %s {condition}
                 GROUP BY c.category_name, u.currency
                 ORDER BY total_amount DESC
-                """,
-                (user_id,)
+                """
+        if since is None:
+            cur = self.execute_read("transactions_summary", summary_sql.format(condition=""), (user_id,), user_id)
+        else:
+            cur = self.execute_read(
+                "transactions_summary_since",
+                summary_sql.format(condition="AND t.timestamp >= %s"),
+                (user_id, since),
+                user_id
             )
+        with cur:
             return cur.fetchall()
     
-    def user_exists(self, user_id: int) -> bool:
-        """Check if a user exists in the users table"""
-        with self.get_cursor() as cur:
-            cur.execute("SELECT 1 FROM users WHERE user_id = %s", (user_id,))
-            return cur.fetchone() is not None
-    
-    def create_user(self, user_id: int, currency: str):
-        """Create a new user with the specified currency"""
+    def get_categories_initialized(self, user_id: int):
+        """Check whether a user's categories are set up (None if the user does not exist)"""
         with self.get_cursor() as cur:
-            cur.execute(
-                "INSERT INTO users (user_id, currency) VALUES (%s, %s)",
-                (user_id, currency)
+            self.queries.execute(
+                cur,
+                "categories_initialized",
+                "SELECT categories_initialized FROM users WHERE user_id = %s",
+                (user_id,),
+                readonly=True
             )
-            self.connection.commit()
+            row = cur.fetchone()
+            return row[0] if row else None
     
     def get_user_currency(self, user_id: int) -> str:
         """Get the user's default currency"""
         with self.get_cursor() as cur:
-            cur.execute("SELECT currency FROM users WHERE user_id = %s", (user_id,))
+            self.queries.execute(
+                cur,
+                "user_currency",
+                "SELECT currency FROM users WHERE user_id = %s",
+                (user_id,),
+                readonly=True
+            )
             row = cur.fetchone()
             return row[0] if row else "USD"
     
-    def get_conversion_rate(self, from_currency: str, to_currency: str, target_date: date = None) -> float:
-        """Get conversion rate from database or fetch from API"""
+    def get_conversion_rate(self, from_currency: str, to_currency: str, target_date: date = None):
+        """Get (rate, is_fallback) from cached USD rates; is_fallback means snapshot rates were used"""
         if target_date is None:
             target_date = date.today()
         
+        usd_rates, is_fallback = self.get_usd_rates(target_date)
+        return self.calculate_rate_from_usd_rates(from_currency, to_currency, usd_rates), is_fallback
+    
+    def get_usd_rates(self, target_date: date):
+        """Get (usd_rates, is_fallback) for a date from the database, or the bundled snapshot if not cached"""
         # Check if USD rates for this date exist in database
         usd_rates = self.get_cached_usd_rates(target_date)
         if usd_rates:
-            # Calculate conversion rate from cached USD rates
-            return self.calculate_rate_from_usd_rates(from_currency, to_currency, usd_rates)
+            return usd_rates, False
         
-        # USD rates not found, fetch from API and cache
-        return self.fetch_and_cache_usd_rates(target_date, from_currency, to_currency)
+        # Fetching over HTTP would block the event loop here; callers fetch and cache rates
+        # beforehand in a thread, and the reconvert job corrects amounts converted with the snapshot
+        return self.rates.get_snapshot_rates(), True
     
     def get_cached_usd_rates(self, target_date: date) -> dict:
         """Get cached USD rates for a specific date"""
         with self.get_cursor() as cur:
-            cur.execute(
+            self.queries.execute(
+                cur,
+                "cached_usd_rates",
                 "SELECT to_currency, rate FROM conversion_rates WHERE date = %s AND from_currency = 'USD'",
-                (target_date,)
+                (target_date,),
+                readonly=True
             )
             rows = cur.fetchall()
             if rows:
@@ -183,74 +430,314 @@ class Database:
             usd_to_target_rate = usd_rates.get(to_currency.lower(), 1.0)
             return from_to_usd_rate * usd_to_target_rate
     
-    def fetch_and_cache_usd_rates(self, target_date: date, from_currency: str, to_currency: str) -> float:
-        """Fetch USD rates from API and cache them, then calculate the needed conversion rate"""
-        try:
-            # Fetch USD rates from API
-            response = requests.get("https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json")
-            response.raise_for_status()
-            
-            api_data = response.json()
-            usd_rates = api_data.get('usd', {})
-            
-            # Cache all USD rates in database
-            with self.get_cursor() as cur:
-                for currency, rate in usd_rates.items():
-                    # Skip currencies with codes longer than 3 characters
-                    if len(currency) > 3:
-                        print(f"Skipping currency {currency} - code too long")
-                        continue
-                    
-                    cur.execute(
-                        """
-                        INSERT INTO conversion_rates (date, from_currency, to_currency, rate)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (date, from_currency, to_currency) DO UPDATE SET rate = EXCLUDED.rate
-                        """,
-                        (target_date, 'USD', currency.upper(), rate)
-                    )
-                self.connection.commit()
-            
-            print(f"Cached USD rates for {target_date}: {len(usd_rates)} currencies")
-            
-            # Calculate and return the needed conversion rate
-            return self.calculate_rate_from_usd_rates(from_currency, to_currency, usd_rates)
-            
-        except Exception as e:
-            print(f"Error fetching USD rates: {e}")
-            # Fallback to 1:1 conversion if API fails
-            return 1.0
+    def cache_usd_rates(self, target_date: date, usd_rates: dict):
+        """Store fetched USD rates for a date"""
+        # Skip currencies with codes longer than 3 characters
+        currencies = [currency.upper() for currency in usd_rates if len(currency) <= 3]
+        rates = [usd_rates[currency.lower()] for currency in currencies]
+        
+        # Cache all USD rates in database with a single statement
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "cache_usd_rates",
+                """
+                INSERT INTO conversion_rates (date, from_currency, to_currency, rate)
+                SELECT %s::date, 'USD', to_currency, rate
+                FROM unnest(%s::text[], %s::numeric[]) AS rates(to_currency, rate)
+                ON CONFLICT (date, from_currency, to_currency) DO UPDATE SET rate = EXCLUDED.rate
+                """,
+                (target_date, currencies, rates)
+            )
+            self.connection.commit()
+        
+        print(f"Cached USD rates for {target_date}: {len(usd_rates)} currencies")
+    
+    def get_fallback_rate_dates(self) -> list:
+        """Get dates of transactions converted with fallback rates that have no cached USD rates yet"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "fallback_rate_dates",
+                """
+                SELECT DISTINCT t.timestamp::date
+                FROM transactions t
+                WHERE t.rate_is_fallback
+                  AND NOT EXISTS (
+                      SELECT 1 FROM conversion_rates r
+                      WHERE r.date = t.timestamp::date AND r.from_currency = 'USD'
+                  )
+                ORDER BY 1
+                """,
+                readonly=True
+            )
+            return [row[0] for row in cur.fetchall()]
+    
+    def reconvert_fallback_transactions(self) -> int:
+        """Re-convert fallback-rate transactions whose dates now have cached USD rates, in one statement"""
+        with self.get_cursor() as cur:
+            # Same cross-rate as calculate_rate_from_usd_rates: amount / usd[from] * usd[to]
+            self.queries.execute(
+                cur,
+                "reconvert_fallback_transactions",
+                """
+                UPDATE transactions t
+                SET default_currency_amount = t.amount / from_rate.rate * to_rate.rate,
+                    rate_is_fallback = FALSE
+                FROM users u, conversion_rates from_rate, conversion_rates to_rate
+                WHERE t.rate_is_fallback
+                  AND u.user_id = t.user_id
+                  AND from_rate.date = t.timestamp::date
+                  AND from_rate.from_currency = 'USD'
+                  AND from_rate.to_currency = upper(t.currency)
+                  AND to_rate.date = t.timestamp::date
+                  AND to_rate.from_currency = 'USD'
+                  AND to_rate.to_currency = upper(u.currency)
+                RETURNING t.user_id
+                """
+            )
+            user_ids = [row[0] for row in cur.fetchall()]
+            self.connection.commit()
+            for user_id in set(user_ids):
+                self.mark_write(user_id)
+            return len(user_ids)
     
     def delete_transaction(self, transaction_id: int):
         """Delete a transaction by ID"""
         with self.get_cursor() as cur:
-            cur.execute("DELETE FROM transactions WHERE transaction_id = %s", (transaction_id,))
+            self.queries.execute(
+                cur,
+                "delete_transaction",
+                "DELETE FROM transactions WHERE transaction_id = %s RETURNING user_id",
+                (transaction_id,)
+            )
+            for (user_id,) in cur.fetchall():
+                self.mark_write(user_id)
             self.connection.commit()
 
+    def get_requested_transaction_id(self, request_key: str):
+        """Get the ID of the transaction created by a request key (None if there is none)"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "requested_transaction_id",
+                "SELECT transaction_id FROM transaction_requests WHERE request_key = %s",
+                (request_key,),
+                readonly=True
+            )
+            row = cur.fetchone()
+            return row[0] if row else None
+
     def get_transaction(self, transaction_id: int):
         """Get transaction details by ID"""
         with self.get_cursor() as cur:
-            cur.execute(
+            self.queries.execute(
+                cur,
+                "transaction",
                 """
                 SELECT t.transaction_id, t.user_id, t.amount, t.currency, t.message, t.category_id, c.category_name
                 FROM transactions t
                 LEFT JOIN categories c ON t.category_id = c.id
                 WHERE t.transaction_id = %s
                 """,
-                (transaction_id,)
+                (transaction_id,),
+                readonly=True
             )
             return cur.fetchone()
 
     def update_transaction_category(self, transaction_id: int, new_category_id: int):
         """Update transaction category"""
         with self.get_cursor() as cur:
-            cur.execute(
-                "UPDATE transactions SET category_id = %s WHERE transaction_id = %s",
+            self.queries.execute(
+                cur,
+                "update_transaction_category",
+                "UPDATE transactions SET category_id = %s WHERE transaction_id = %s RETURNING user_id",
                 (new_category_id, transaction_id)
             )
+            for (user_id,) in cur.fetchall():
+                self.mark_write(user_id)
+            self.connection.commit()
+
+    def set_digest_frequency(self, user_id: int, frequency: str = None):
+        """Subscribe a user to weekly/monthly digests, or unsubscribe with None"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "set_digest_frequency",
+                "UPDATE users SET digest_frequency = %s WHERE user_id = %s",
+                (frequency, user_id)
+            )
+            self.connection.commit()
+
+    def get_digest_frequency(self, user_id: int):
+        """Get the user's digest subscription (None if disabled)"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "digest_frequency",
+                "SELECT digest_frequency FROM users WHERE user_id = %s",
+                (user_id,),
+                readonly=True
+            )
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    def start_digest_run(self, frequency: str, period_start: date, period_end: date) -> int:
+        """Create a digest run for the period (or return the existing one) and return its ID"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "start_digest_run",
+                """
+                INSERT INTO digest_runs (frequency, period_start, period_end)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (frequency, period_start) DO UPDATE SET period_end = EXCLUDED.period_end
+                RETURNING id
+                """,
+                (frequency, period_start, period_end)
+            )
+            run_id = cur.fetchone()[0]
             self.connection.commit()
+            return run_id
+
+    def get_unfinished_digest_runs(self):
+        """Get digest runs that were interrupted before all users were handled"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "unfinished_digest_runs",
+                """
+                SELECT id, frequency, period_start, period_end
+                FROM digest_runs
+                WHERE finished_at IS NULL
+                ORDER BY id
+                """,
+                readonly=True
+            )
+            return cur.fetchall()
+
+    def get_digest_summaries(self, run_id: int, frequency: str, period_start: date, period_end: date):
+        """Yield per-category totals for every subscribed user not yet handled (or to be retried) in the run"""
+        # On the primary: digest_deliveries was just written there, and a lagging replica would re-send digests
+        return self.stream_read(
+            "digest_summaries",
+            """
+            SELECT u.user_id, c.category_name, SUM(t.default_currency_amount) as total_amount, u.currency
+            FROM users u
+            JOIN transactions t ON t.user_id = u.user_id
+            LEFT JOIN categories c ON t.category_id = c.id
+            WHERE u.digest_frequency = %s
+              AND t.timestamp >= %s AND t.timestamp < %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM digest_deliveries d
+                  WHERE d.run_id = %s AND d.user_id = u.user_id AND d.status <> 'retry'
+              )
+            GROUP BY u.user_id, c.category_name, u.currency
+            ORDER BY u.user_id, total_amount DESC
+            """,
+            (frequency, period_start, period_end, run_id),
+            use_replica=False
+        )
+
+    def record_digest_delivery(self, run_id: int, user_id: int, status: str):
+        """Mark a user as handled within a digest run"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "record_digest_delivery",
+                """
+                INSERT INTO digest_deliveries (run_id, user_id, status)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (run_id, user_id) DO UPDATE SET status = EXCLUDED.status
+                """,
+                (run_id, user_id, status)
+            )
+            self.connection.commit()
+
+    def finish_digest_run(self, run_id: int):
+        """Mark a digest run as finished"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "finish_digest_run",
+                "UPDATE digest_runs SET finished_at = CURRENT_TIMESTAMP WHERE id = %s",
+                (run_id,)
+            )
+            self.connection.commit()
+
+    def get_asset_file_id(self, content_hash: str):
+        """Get the Telegram file_id of an uploaded static asset"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "asset_file_id",
+                "SELECT file_id FROM static_assets WHERE content_hash = %s",
+                (content_hash,),
+                readonly=True
+            )
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    def save_asset_file_id(self, content_hash: str, asset_path: str, file_id: str):
+        """Store the Telegram file_id of an uploaded static asset"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "save_asset_file_id",
+                """
+                INSERT INTO static_assets (content_hash, asset_path, file_id)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (content_hash) DO UPDATE
+                SET asset_path = EXCLUDED.asset_path, file_id = EXCLUDED.file_id, updated_at = CURRENT_TIMESTAMP
+                """,
+                (content_hash, asset_path, file_id)
+            )
+            self.connection.commit()
+
+    def ensure_transactions_partitions(self, months_ahead: int) -> int:
+        """Create missing monthly transactions partitions and return how many were created"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "ensure_transactions_partitions",
+                "SELECT ensure_transactions_partitions(%s)",
+                (months_ahead,)
+            )
+            created = cur.fetchone()[0]
+            self.connection.commit()
+            return created
+
+    def delete_old_transaction_requests(self, days: int) -> int:
+        """Delete transaction idempotency keys older than the given number of days"""
+        with self.get_cursor() as cur:
+            self.queries.execute(
+                cur,
+                "delete_old_transaction_requests",
+                "DELETE FROM transaction_requests WHERE created_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+                (days,)
+            )
+            deleted = cur.rowcount
+            self.connection.commit()
+            return deleted
+
+    def get_query_report(self, limit: int = 5):
+        """Get (name, stats, plan) of the slowest queries, with plans from their last parameters"""
+        report = []
+        with self.get_cursor() as cur:
+            for name, stats in self.queries.get_slowest(limit):
+                try:
+                    plan = self.queries.explain(cur, name)
+                except Exception as e:
+                    plan = f"EXPLAIN failed: {e}"
+                # Don't leave the connection in an open (or failed) transaction
+                self.connection.rollback()
+                report.append((name, stats, plan))
+        return report
 
     def close(self):
-        """Close database connection"""
+        """Close database connections and the rate fetch pool"""
+        self.rates.cleanup()
         if self.connection and not self.connection.closed:
-            self.connection.close() 
\ No newline at end of file
+            self.connection.close()
+        if self.read_connection and not self.read_connection.closed:
+            self.read_connection.close() 
\ No newline at end of file
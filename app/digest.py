@@ -0,0 +1,107 @@
+import asyncio
+from datetime import date, timedelta
+from itertools import groupby
+from telegram.error import Forbidden
+from config import Config
+from send_queue import BULK
+from summary import prepare_summary, format_summary_text
+
+class DigestJob:
+    """Weekly/monthly spending digest fan-out to subscribed users"""
+
+    def __init__(self, db, chart_generator, sender, memory_governor):
+        self.db = db
+        self.chart_generator = chart_generator
+        self.sender = sender
+        self.memory_governor = memory_governor
+
+    @staticmethod
+    def get_period(frequency: str, today: date):
+        """Get the (start, end, title) of the period that ended before today"""
+        if frequency == "weekly":
+            period_end = today - timedelta(days=today.weekday())
+            period_start = period_end - timedelta(days=7)
+            title = f"Week of {period_start:%d %b %Y}"
+        else:
+            period_end = today.replace(day=1)
+            period_start = (period_end - timedelta(days=1)).replace(day=1)
+            title = f"{period_start:%B %Y}"
+        return period_start, period_end, title
+
+    async def run(self, context):
+        """Job callback: send the digest for the period that just ended"""
+        frequency = context.job.data
+        period_start, period_end, title = self.get_period(frequency, date.today())
+        run_id = self.db.start_digest_run(frequency, period_start, period_end)
+        await self.deliver(run_id, frequency, period_start, period_end, title)
+
+    async def resume(self, context):
+        """Job callback: finish digest runs interrupted by a restart"""
+        for run_id, frequency, period_start, period_end in self.db.get_unfinished_digest_runs():
+            print(f"Resuming {frequency} digest run {run_id} for {period_start}")
+            _, _, title = self.get_period(frequency, period_end)
+            await self.deliver(run_id, frequency, period_start, period_end, title)
+
+    async def deliver(self, run_id: int, frequency: str, period_start: date, period_end: date, title: str):
+        """Render and send digests to every user not yet handled in the run, retrying transient failures"""
+        for attempt in range(1, Config.DIGEST_MAX_ATTEMPTS + 1):
+            results = await self.deliver_pass(run_id, frequency, period_start, period_end, title)
+            retries = results.count(False)
+            if not retries:
+                self.db.finish_digest_run(run_id)
+                print(f"Finished {frequency} digest run {run_id}: {len(results)} users")
+                return
+            print(f"{frequency.capitalize()} digest run {run_id} attempt {attempt}: {retries} of {len(results)} users to retry")
+            if attempt < Config.DIGEST_MAX_ATTEMPTS:
+                await asyncio.sleep(Config.DIGEST_RETRY_SECONDS)
+
+        # Left unfinished, so resume() retries the remaining users after the next restart
+        print(f"{frequency.capitalize()} digest run {run_id} left unfinished with {retries} users to retry")
+
+    async def deliver_pass(self, run_id: int, frequency: str, period_start: date, period_end: date, title: str) -> list:
+        """Send digests to users not yet handled (or to be retried) in the run; returns False for each user to retry"""
+        rows = self.db.get_digest_summaries(run_id, frequency, period_start, period_end)
+
+        # Bound the number of rendered charts held in memory while waiting to be sent
+        slots = asyncio.Semaphore(Config.CHART_RENDER_WORKERS * 2)
+        tasks = []
+        for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+            category_totals = [row[1:] for row in user_rows]
+            await slots.acquire()
+            tasks.append(asyncio.create_task(
+                self.deliver_to_user(slots, run_id, user_id, category_totals, title)
+            ))
+        return await asyncio.gather(*tasks)
+
+    async def deliver_to_user(self, slots, run_id: int, user_id: int, category_totals: list, title: str) -> bool:
+        """Render and send one user's digest, recording the outcome; returns False if it should be retried"""
+        try:
+            categories, amounts, currency = prepare_summary(category_totals)
+            if not categories:
+                self.db.record_digest_delivery(run_id, user_id, "empty")
+                return True
+
+            chart_buffer = await self.memory_governor.render_chart(
+                self.chart_generator, categories, amounts, currency, title
+            )
+
+            await self.sender.send_photo_with_text(
+                user_id,
+                photo=chart_buffer,
+                text=format_summary_text(categories, amounts, currency, title),
+                priority=BULK
+            )
+            self.db.record_digest_delivery(run_id, user_id, "sent")
+            return True
+        except Forbidden:
+            # User blocked the bot - stop sending digests to them (the only terminal failure)
+            self.db.set_digest_frequency(user_id, None)
+            self.db.record_digest_delivery(run_id, user_id, "blocked")
+            return True
+        except Exception as e:
+            # Network errors, flood control after all retries, etc. - try again in a later pass
+            print(f"Error sending digest to {user_id}, will retry: {e}")
+            self.db.record_digest_delivery(run_id, user_id, "retry")
+            return False
+        finally:
+            slots.release()
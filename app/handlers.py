@@ -1,9 +1,16 @@
+import asyncio
 import re
+from datetime import date, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
 from database import Database
 from chart_generator import ChartGenerator
 from config import Config
+from summary import prepare_summary, format_summary_text
+from send_queue import SendQueue
+from assets import AssetRegistry
+from cache import TTLCache
+from memory import MemoryGovernor
 
 class BotHandlers:
     """Main bot handlers class"""
@@ -11,18 +18,32 @@ class BotHandlers:
     def __init__(self):
         self.db = Database()
         self.chart_generator = ChartGenerator()
-        self.pending_transactions = {}  # Temporary storage for pending transactions
+        self.memory_governor = MemoryGovernor()
+        self.sender = SendQueue()  # Outbound queue for every message the bot sends, edits or deletes
+        self.assets = AssetRegistry(self.db)
+        # Redelivered updates, and repeated taps on the same button of the same message
+        self.processed_updates = TTLCache(Config.IDEMPOTENCY_CACHE_SIZE, Config.PROCESSED_UPDATES_TTL_SECONDS)
+        self.recent_callbacks = TTLCache(Config.IDEMPOTENCY_CACHE_SIZE, Config.DUPLICATE_CALLBACK_SECONDS)
+        # Pending transactions and category renames (category ID awaiting a new name) per user,
+        # bounded and expiring so abandoned inputs don't pile up in memory
+        self.pending_transactions = TTLCache(Config.IDEMPOTENCY_CACHE_SIZE, Config.PENDING_INPUT_TTL_SECONDS)
+        self.pending_renames = TTLCache(Config.IDEMPOTENCY_CACHE_SIZE, Config.PENDING_INPUT_TTL_SECONDS)
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /start command"""
         user_id = update.effective_user.id
         
         # Check if user exists
-        if not self.db.user_exists(user_id):
+        categories_initialized = self.db.get_categories_initialized(user_id)
+        if categories_initialized is None:
             # Show currency selection
             await self.show_currency_selection(update, context)
             return
         
+        # Initialize categories only for users onboarded before they were set up
+        if not categories_initialized:
+            self.db.initialize_user_categories(user_id)
+        
         # User exists, show welcome message
         await self.show_welcome_message(update, context)
     
@@ -40,7 +61,8 @@ class BotHandlers:
         
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await self.sender.reply_text(
+            update.message,
             "👋 Welcome to your personal spending tracker!\n\n"
             "💰 **What is your default currency?**\n"
             "Please select your preferred currency:",
@@ -49,11 +71,6 @@ class BotHandlers:
     
     async def show_welcome_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Show welcome message for existing users"""
-        user_id = update.effective_user.id
-
-        # Initialize user categories
-        self.db.initialize_user_categories(user_id)
-
         # Show persistent keyboard menu
         keyboard = [
             [KeyboardButton("🤌 Summarize"), KeyboardButton("🧐 Help")]
@@ -61,18 +78,18 @@ class BotHandlers:
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
 
         # Send welcome image with caption
-        with open('images/welcome.png', 'rb') as photo:
-            await update.message.reply_photo(
-                photo=photo,
-                caption="👋 Welcome to your personal spending tracker!",
-                reply_markup=reply_markup
-            )
+        await self.assets.send_photo(
+            lambda **kwargs: self.sender.send_photo(update.message.chat_id, **kwargs),
+            Config.WELCOME_IMAGE,
+            caption="👋 Welcome to your personal spending tracker!",
+            reply_markup=reply_markup
+        )
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /help command"""
         user_id = update.effective_user.id
         currency = self.db.get_user_currency(user_id)
-        await update.message.reply_text(Config.HELP_TEXT.format(currency=currency))
+        await self.sender.reply_text(update.message, Config.HELP_TEXT.format(currency=currency))
     
     async def summarize_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /summarize command"""
@@ -84,33 +101,116 @@ class BotHandlers:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await self.sender.reply_text(
+            update.message,
             "📊 Choose a time period for your spending summary:",
             reply_markup=reply_markup
         )
     
+    async def digest_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /digest command"""
+        user_id = update.effective_user.id
+        frequency = self.db.get_digest_frequency(user_id)
+        current = frequency.capitalize() if frequency else "Off"
+
+        keyboard = [
+            [InlineKeyboardButton("📬 Weekly", callback_data="digest_weekly")],
+            [InlineKeyboardButton("📬 Monthly", callback_data="digest_monthly")],
+            [InlineKeyboardButton("🔕 Off", callback_data="digest_off")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await self.sender.reply_text(
+            update.message,
+            f"📬 Periodic spending digest (currently: {current}).\n"
+            "How often would you like to receive it?",
+            reply_markup=reply_markup
+        )
+    
+    async def categories_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /categories command - list categories with rename/archive buttons"""
+        user_id = update.effective_user.id
+        categories = self.db.get_user_categories(user_id)
+
+        keyboard = [
+            [
+                InlineKeyboardButton(f"✏️ {cat_name}", callback_data=f"catrename_{cat_id}"),
+                InlineKeyboardButton("🗄 Archive", callback_data=f"catarchive_{cat_id}")
+            ]
+            for cat_id, cat_name in categories
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await self.sender.reply_text(
+            update.message,
+            "🗂 Your categories. Tap a name to rename it or archive it.\n"
+            "Use /addcategory <name> to add a new one.",
+            reply_markup=reply_markup
+        )
+
+    async def add_category_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /addcategory command"""
+        user_id = update.effective_user.id
+        category_name = " ".join(context.args).strip()
+
+        if not category_name or len(category_name) > Config.MAX_CATEGORY_NAME_LENGTH:
+            await self.sender.reply_text(
+                update.message,
+                f"Please specify a category name up to {Config.MAX_CATEGORY_NAME_LENGTH} characters, "
+                "e.g. '/addcategory Travel'."
+            )
+            return
+
+        self.db.add_user_category(user_id, category_name)
+        await self.sender.reply_text(update.message, f"✅ Category {category_name} is added.")
+    
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle text messages"""
         message = update.message.text.strip()
+        user_id = update.effective_user.id
+        is_keyboard_button = message in ["🤌 Summarize", "🧐 Help"]
 
-        # Handle keyboard button presses
-        if message in ["🤌 Summarize", "🧐 Help"]:
-            await self.handle_keyboard_button(update, context, message)
-            return
-
-        # Handle transaction input - two patterns:
+        # Transaction input - two patterns:
         # 1. Number + currency code (e.g., "100 USD groceries" or "20,5 EUR coffee")
         # 2. Just number (e.g., "100 groceries" or "20,5 coffee") - uses default currency
         # Allow both dot and comma as decimal separators
         match_with_currency = re.match(r'^(\d+(?:[.,]\d{1,2})?)\s*([A-Za-z]{3})\b(.*)$', message)
         match_just_number = re.match(r'^(\d+(?:[.,]\d{1,2})?)\s*(.*)$', message)
 
+        # Handle a new name for a category being renamed; a button press or a spend cancels the rename instead
+        category_id = self.pending_renames.pop(user_id)
+        if category_id is not None and not (is_keyboard_button or match_just_number):
+            await self.handle_category_rename(update, context, category_id, message)
+            return
+
+        # Handle keyboard button presses
+        if is_keyboard_button:
+            await self.handle_keyboard_button(update, context, message)
+            return
+
         if match_with_currency:
             await self.handle_transaction_input(update, context, match_with_currency, has_currency=True)
         elif match_just_number:
             await self.handle_transaction_input(update, context, match_just_number, has_currency=False)
         else:
-            await update.message.reply_text("Please send a number (e.g., '100 groceries') or a number with currency (e.g., '100 USD groceries').")
+            await self.sender.reply_text(update.message, "Please send a number (e.g., '100 groceries') or a number with currency (e.g., '100 USD groceries').")
+    
+    async def handle_category_rename(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category_id: int, category_name: str) -> None:
+        """Rename a category to the name the user sent"""
+        user_id = update.effective_user.id
+
+        if len(category_name) > Config.MAX_CATEGORY_NAME_LENGTH:
+            await self.sender.reply_text(
+                update.message,
+                f"Category name must be up to {Config.MAX_CATEGORY_NAME_LENGTH} characters. Please use /categories to try again."
+            )
+            return
+
+        if not self.db.rename_user_category(user_id, category_id, category_name):
+            await self.sender.reply_text(update.message, f"You already have a category named {category_name}.")
+            return
+
+        await self.sender.reply_text(update.message, f"✅ Category renamed to {category_name}.")
     
     async def handle_transaction_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, match, has_currency: bool) -> None:
         """Handle transaction input and show category selection"""
@@ -131,15 +231,15 @@ class BotHandlers:
         # Get categories for the user
         categories = self.db.get_user_categories(user_id)
         if not categories:
-            await update.message.reply_text("No categories found. Please use /start to initialize your categories.")
+            await self.sender.reply_text(update.message, "No categories found. Please use /start to initialize your categories.")
             return
 
         # Store pending transaction
-        self.pending_transactions[user_id] = {
+        self.pending_transactions.set(user_id, {
             'amount': amount,
             'currency': currency.upper(),
             'message': message_without_amount_currency.strip()
-        }
+        })
 
         # Show categories as buttons
         keyboard = [
@@ -147,7 +247,8 @@ class BotHandlers:
             for cat_id, cat_name in categories
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(
+        await self.sender.reply_text(
+            update.message,
             "Please select a category for this transaction:",
             reply_markup=reply_markup
         )
@@ -163,7 +264,8 @@ class BotHandlers:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await update.message.reply_text(
+            await self.sender.reply_text(
+                update.message,
                 "📊 Choose a time period for your spending summary:",
                 reply_markup=reply_markup
             )
@@ -171,7 +273,7 @@ class BotHandlers:
         elif button_text == "🧐 Help":
             user_id = update.effective_user.id
             currency = self.db.get_user_currency(user_id)
-            await update.message.reply_text(Config.HELP_TEXT.format(currency=currency))
+            await self.sender.reply_text(update.message, Config.HELP_TEXT.format(currency=currency))
     
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle callback queries"""
@@ -180,6 +282,33 @@ class BotHandlers:
 
         print(f"Callback received: {data}")  # Debug print
 
+        # Short-circuit duplicates before any DB or chart work
+        if not query.message:
+            callback_key = query.id
+        elif data.startswith(("cat_", "currency_")):
+            # One write per prompt: taps on two different buttons of the same prompt are duplicates too
+            callback_key = f"{query.message.chat_id}:{query.message.message_id}"
+        else:
+            # Editing the message changes edit_date, so taps on the updated buttons are not duplicates
+            edit_date = query.message.edit_date.timestamp() if query.message.edit_date else 0
+            callback_key = f"{query.message.chat_id}:{query.message.message_id}:{edit_date}:{data}"
+        if not self.processed_updates.add(update.update_id) or not self.recent_callbacks.add(callback_key):
+            print(f"Duplicate callback ignored: {data}")
+            await query.answer()
+            return
+
+        try:
+            await self.dispatch_callback_query(update, context)
+        except Exception:
+            # Allow the user to retry right away after a failure
+            self.recent_callbacks.pop(callback_key)
+            raise
+    
+    async def dispatch_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Route a callback query to its handler"""
+        query = update.callback_query
+        data = query.data
+
         if data.startswith("summarize_"):
             await self.handle_summarize_callback(update, context)
         elif data.startswith("cat_"):
@@ -192,6 +321,14 @@ class BotHandlers:
             await self.handle_edit_callback(update, context)
         elif data.startswith("editcat_"):
             await self.handle_edit_category_callback(update, context)
+        elif data.startswith("digest_"):
+            await self.handle_digest_callback(update, context)
+        elif data.startswith("catrename_"):
+            await self.handle_rename_category_callback(update, context)
+        elif data.startswith("catarchive_"):
+            await self.handle_archive_category_callback(update, context)
+        elif data == "catcancel":
+            await self.handle_cancel_rename_callback(update, context)
         else:
             print(f"Unknown callback data: {data}")
             await query.answer("Unknown callback")
@@ -210,22 +347,48 @@ class BotHandlers:
         
         print(f"Processing category callback: {data}")  # Debug print
         category_id = int(data.split("_", 1)[1])
+        request_key = f"{query.message.chat_id}:{query.message.message_id}"
         transaction = self.pending_transactions.pop(user_id, None)
         
         if not transaction:
-            await query.edit_message_text("No pending transaction found. Please enter your spend again.")
+            # A late second tap on this prompt: show the transaction it already created again
+            transaction_id = self.db.get_requested_transaction_id(request_key)
+            saved = self.db.get_transaction(transaction_id) if transaction_id else None
+            if not saved or saved[1] != user_id:
+                await self.sender.edit_text(query.message, "No pending transaction found. Please enter your spend again.")
+                return
+            await self.show_transaction_saved(query, transaction_id, saved[2], saved[3], saved[6])
             return
         
+        # Make sure today's rates are cached before converting; the snapshot is used if no source answers
+        if transaction['currency'] != self.db.get_user_currency(user_id):
+            await self.refresh_usd_rates(date.today())
+        
         # Get category name and save transaction
-        category_name = self.db.get_category_name(category_id)
+        category_name = self.db.get_category_name(category_id, user_id)
         transaction_id = self.db.save_transaction(
             user_id,
             transaction['amount'],
             transaction['currency'],
             transaction['message'],
-            category_id
+            category_id,
+            request_key=request_key
         )
-
+        await self.show_transaction_saved(query, transaction_id, transaction['amount'], transaction['currency'], category_name)
+
+    async def refresh_usd_rates(self, target_date: date) -> bool:
+        """Fetch and cache USD rates for a date if missing; returns False if no rate source answered"""
+        if self.db.get_cached_usd_rates(target_date):
+            return True
+        # Slow sources can take the full timeout, so fetch off the event loop (database work stays on it)
+        usd_rates, is_fallback = await asyncio.to_thread(self.db.rates.get_usd_rates, target_date)
+        if is_fallback:
+            return False
+        self.db.cache_usd_rates(target_date, usd_rates)
+        return True
+
+    async def show_transaction_saved(self, query, transaction_id: int, amount, currency: str, category_name: str) -> None:
+        """Replace the category prompt with the saved transaction and its Edit/Delete buttons"""
         # Add Edit and Delete buttons
         keyboard = [
             [
@@ -235,8 +398,9 @@ class BotHandlers:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await query.edit_message_text(
-            f"✅ Transaction {transaction['amount']} {transaction['currency']} is written under category: {category_name}.",
+        await self.sender.edit_text(
+            query.message,
+            f"✅ Transaction {amount} {currency} is written under category: {category_name}.",
             reply_markup=reply_markup
         )
     
@@ -251,14 +415,16 @@ class BotHandlers:
         # Extract currency from callback data
         currency = data.replace("currency_", "")
         
-        # Create user with selected currency
-        self.db.create_user(user_id, currency)
-        
-        # Initialize user categories
-        self.db.initialize_user_categories(user_id)
+        # Create user with selected currency and default categories
+        if not self.db.onboard_user(user_id, currency):
+            # An old currency keyboard or a second tap - the currency was chosen already
+            current = self.db.get_user_currency(user_id)
+            await self.sender.edit_text(query.message, f"Your default currency is already set to **{current}**.")
+            return
         
         # First, edit the original message to confirm currency selection
-        await query.edit_message_text(
+        await self.sender.edit_text(
+            query.message,
             f"✅ Perfect! Your default currency is set to **{currency}**."
         )
         
@@ -268,13 +434,12 @@ class BotHandlers:
         ]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
 
-        with open('images/welcome.png', 'rb') as photo:
-            await context.bot.send_photo(
-                chat_id=query.from_user.id,
-                photo=photo,
-                caption="👋 Welcome to your personal spending tracker!",
-                reply_markup=reply_markup
-            )
+        await self.assets.send_photo(
+            lambda **kwargs: self.sender.send_photo(query.from_user.id, **kwargs),
+            Config.WELCOME_IMAGE,
+            caption="👋 Welcome to your personal spending tracker!",
+            reply_markup=reply_markup
+        )
     
     async def handle_summarize_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle summarize callback"""
@@ -292,69 +457,51 @@ class BotHandlers:
         
         period = data.replace("summarize_", "")
         
-        # Build the SQL query based on the selected period
+        # Get the start date of the selected period
+        today = date.today()
         if period == "this_month":
-            sql_condition = "AND EXTRACT(MONTH FROM t.timestamp) = EXTRACT(MONTH FROM CURRENT_DATE) AND EXTRACT(YEAR FROM t.timestamp) = EXTRACT(YEAR FROM CURRENT_DATE)"
+            since = today.replace(day=1)
             period_title = "This Month"
         elif period == "7_days":
-            sql_condition = "AND t.timestamp >= CURRENT_DATE - INTERVAL '7 days'"
+            since = today - timedelta(days=7)
             period_title = "Last 7 Days"
         elif period == "30_days":
-            sql_condition = "AND t.timestamp >= CURRENT_DATE - INTERVAL '30 days'"
+            since = today - timedelta(days=30)
             period_title = "Last 30 Days"
         elif period == "all":
-            sql_condition = ""
+            since = None
             period_title = "All Time"
         else:
-            await query.edit_message_text("Invalid time period selected.")
+            await self.sender.edit_text(query.message, "Invalid time period selected.")
             return
         
         # Get transaction data
-        category_totals = self.db.get_transactions_summary(user_id, sql_condition)
+        category_totals = self.db.get_transactions_summary(user_id, since)
         
         if not category_totals:
-            await query.edit_message_text(f"You have no transactions for {period_title.lower()}.")
+            await self.sender.edit_text(query.message, f"You have no transactions for {period_title.lower()}.")
             return
         
         # Prepare data for the chart
-        categories = []
-        amounts = []
-        currency = category_totals[0][2] if category_totals else "USD"
-        
-        for category_name, total_amount, curr in category_totals:
-            if category_name:  # Only include categorized transactions
-                categories.append(category_name)
-                amounts.append(float(total_amount))
+        categories, amounts, currency = prepare_summary(category_totals)
         
         if not categories:
-            await query.edit_message_text(f"You have no categorized transactions for {period_title.lower()}.")
+            await self.sender.edit_text(query.message, f"You have no categorized transactions for {period_title.lower()}.")
             return
         
         # Create and send chart
-        chart_buffer = self.chart_generator.create_spending_chart(categories, amounts, currency, period_title)
-        
-        # Delete the time selection message
-        try:
-            await query.delete_message()
-        except:
-            pass  # Ignore if message can't be deleted
-        
-        # Send the chart
-        await context.bot.send_photo(
-            chat_id=query.from_user.id,
-            photo=chart_buffer,
+        chart_buffer = await self.memory_governor.render_chart(
+            self.chart_generator, categories, amounts, currency, period_title
         )
         
-        # Also send a text summary
-        summary_lines = [f"📊 **Spending Summary - {period_title}:**"]
-        for i, (category, amount) in enumerate(zip(categories, amounts), 1):
-            percentage = (amount / sum(amounts)) * 100
-            summary_lines.append(f"{i}. {category}: {amount:.2f} {currency} ({percentage:.1f}%)")
+        # Delete the time selection message (failures are logged by the queue and ignored)
+        self.sender.delete_message(query.message.chat_id, query.message.message_id)
         
-        summary_lines.append(f"\n💰 **Total Spent**: {sum(amounts):.2f} {currency}")
-        await context.bot.send_message(
-            chat_id=query.from_user.id,
-            text="\n".join(summary_lines)
+        # Send the chart with the text summary as its caption
+        self.sender.send_photo_with_text(
+            query.from_user.id,
+            photo=chart_buffer,
+            text=format_summary_text(categories, amounts, currency, period_title)
         )
     
     async def handle_delete_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -370,7 +517,7 @@ class BotHandlers:
         # Delete the transaction
         self.db.delete_transaction(transaction_id)
 
-        await query.edit_message_text("🗑️ Transaction deleted successfully!")
+        await self.sender.edit_text(query.message, "🗑️ Transaction deleted successfully!")
 
     async def handle_edit_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle edit transaction callback - show category options"""
@@ -386,13 +533,13 @@ class BotHandlers:
         # Get transaction details
         transaction = self.db.get_transaction(transaction_id)
         if not transaction:
-            await query.edit_message_text("Transaction not found.")
+            await self.sender.edit_text(query.message, "Transaction not found.")
             return
 
         # Get user categories
         categories = self.db.get_user_categories(user_id)
         if not categories:
-            await query.edit_message_text("No categories found.")
+            await self.sender.edit_text(query.message, "No categories found.")
             return
 
         # Show categories for editing
@@ -402,7 +549,8 @@ class BotHandlers:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await query.edit_message_text(
+        await self.sender.edit_text(
+            query.message,
             f"✏️ Select new category for {transaction[2]} {transaction[3]}:",
             reply_markup=reply_markup
         )
@@ -421,7 +569,7 @@ class BotHandlers:
 
         # Get transaction and category details
         transaction = self.db.get_transaction(transaction_id)
-        new_category_name = self.db.get_category_name(new_category_id)
+        new_category_name = self.db.get_category_name(new_category_id, query.from_user.id)
 
         # Update the transaction category
         self.db.update_transaction_category(transaction_id, new_category_id)
@@ -435,11 +583,147 @@ class BotHandlers:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await query.edit_message_text(
+        await self.sender.edit_text(
+            query.message,
             f"✅ Transaction {transaction[2]} {transaction[3]} updated to category: {new_category_name}.",
             reply_markup=reply_markup
         )
 
+    async def handle_digest_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle digest subscription callback"""
+        query = update.callback_query
+        data = query.data
+
+        await query.answer()
+        user_id = query.from_user.id
+
+        frequency = data.replace("digest_", "")
+        if frequency == "off":
+            self.db.set_digest_frequency(user_id, None)
+            await self.sender.edit_text(query.message, "🔕 Periodic digest is turned off.")
+        elif frequency in ("weekly", "monthly"):
+            self.db.set_digest_frequency(user_id, frequency)
+            await self.sender.edit_text(query.message, f"📬 You will receive a {frequency} spending digest.")
+        else:
+            await self.sender.edit_text(query.message, "Invalid digest option selected.")
+
+    async def handle_rename_category_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle rename category callback - ask for the new name"""
+        query = update.callback_query
+        data = query.data
+
+        await query.answer()
+        user_id = query.from_user.id
+
+        category_id = int(data.replace("catrename_", ""))
+        category_name = self.db.get_category_name(category_id, user_id)
+        self.pending_renames.set(user_id, category_id)
+
+        reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("✖️ Cancel", callback_data="catcancel")]])
+        await self.sender.edit_text(
+            query.message,
+            f"✏️ Send a new name for {category_name} (it can't start with a number):",
+            reply_markup=reply_markup
+        )
+
+    async def handle_cancel_rename_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle cancel rename callback"""
+        query = update.callback_query
+
+        await query.answer()
+        self.pending_renames.pop(query.from_user.id)
+
+        await self.sender.edit_text(query.message, "Category rename cancelled.")
+
+    async def handle_archive_category_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle archive category callback"""
+        query = update.callback_query
+        data = query.data
+
+        await query.answer()
+        user_id = query.from_user.id
+
+        category_id = int(data.replace("catarchive_", ""))
+
+        # Keep at least one category to record transactions under
+        if len(self.db.get_user_categories(user_id)) <= 1:
+            await self.sender.edit_text(query.message, "You can't archive your last category.")
+            return
+
+        category_name = self.db.get_category_name(category_id, user_id)
+        self.db.archive_user_category(user_id, category_id)
+        await self.sender.edit_text(
+            query.message,
+            f"🗄 Category {category_name} is archived. Its transactions stay in your summaries.\n"
+            "Use /addcategory to restore it."
+        )
+
+    def is_admin(self, user_id: int) -> bool:
+        """Check if the user may use debug commands"""
+        return user_id in Config.ADMIN_USER_IDS
+
+    async def debug_queue_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /debug_queue command - show outbound queue metrics"""
+        if not self.is_admin(update.effective_user.id):
+            return
+
+        stats = self.sender.get_stats()
+        await self.sender.reply_text(
+            update.message,
+            "📤 Send queue\n"
+            f"Depth: {stats['depth']} (max {stats['max_depth']})\n"
+            f"Sent: {stats['sent']}, failed: {stats['failed']}\n"
+            f"API latency p50/p95: {stats['send_p50']:.3f}s / {stats['send_p95']:.3f}s\n"
+            f"Total latency p50/p95: {stats['total_p50']:.3f}s / {stats['total_p95']:.3f}s"
+        )
+
+    async def debug_queries_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /debug_queries command - show the slowest queries and their plans"""
+        if not self.is_admin(update.effective_user.id):
+            return
+
+        report = self.db.get_query_report()
+        if not report:
+            await self.sender.reply_text(update.message, "No queries executed yet.")
+            return
+
+        for name, stats, plan in report:
+            text = (
+                f"🐢 {name}\n"
+                f"Calls: {stats.calls}, mean: {stats.mean_time * 1000:.1f} ms, max: {stats.max_time * 1000:.1f} ms\n\n"
+                f"{plan}"
+            )
+            # Telegram messages are limited to 4096 characters
+            await self.sender.reply_text(update.message, text[:4096])
+
+    async def debug_memory_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /debug_memory command - show memory usage and top allocations"""
+        if not self.is_admin(update.effective_user.id):
+            return
+
+        stats = self.memory_governor.get_stats()
+        figsize, dpi = self.memory_governor.get_chart_settings()
+        lines = [
+            "🧠 Memory",
+            f"RSS: {stats['rss'] / 1024 / 1024:.1f} MB of {stats['budget'] / 1024 / 1024:.0f} MB budget",
+            f"Pressure level: {stats['pressure_level']} (chart {figsize[0]}x{figsize[1]} @ {dpi} dpi)",
+            f"Rendering: {stats['rendering']}, waiting: {stats['waiting']}",
+            f"Pending transactions: {len(self.pending_transactions)}",
+        ]
+
+        if not stats['tracing']:
+            # Start sampling now; allocations show up on the next call
+            self.memory_governor.start_tracing()
+            lines.append("\ntracemalloc started, run /debug_memory again to see top allocations.")
+        else:
+            lines.append("\nTop allocations:")
+            for stat in self.memory_governor.get_top_allocations():
+                frame = stat.traceback[0]
+                lines.append(f"{stat.size / 1024:.1f} KiB ({stat.count}) {frame.filename}:{frame.lineno}")
+
+        await self.sender.reply_text(update.message, "\n".join(lines)[:4096])
+
     def cleanup(self):
         """Cleanup resources"""
+        self.memory_governor.cleanup()
         self.db.close() 
\ No newline at end of file
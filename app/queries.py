@@ -0,0 +1,91 @@
+import re
+import time
+from config import Config
+
+class QueryStats:
+    """Execution statistics for a named query"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_params = ()
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class QueryRegistry:
+    """Named SQL statements, prepared server-side once per connection and timed on every call"""
+
+    def __init__(self, prepare: bool = None):
+        self.prepare = Config.DB_PREPARE_STATEMENTS if prepare is None else prepare
+        self.queries = {}  # name -> (sql, readonly)
+        self.stats = {}  # name -> QueryStats
+        self.prepared = {}  # connection -> names of statements prepared on it
+
+    @staticmethod
+    def to_server_placeholders(sql: str) -> str:
+        """Convert psycopg2 %s placeholders to PREPARE-style $1, $2, ..."""
+        counter = iter(range(1, sql.count('%s') + 1))
+        return re.sub(r'%s', lambda match: f"${next(counter)}", sql)
+
+    def register(self, name: str, sql: str, readonly: bool = False):
+        """Register a statement under a name (no-op if already registered)"""
+        if name not in self.queries:
+            self.queries[name] = (sql, readonly)
+            self.stats[name] = QueryStats()
+
+    def forget(self, connection):
+        """Drop prepared statement bookkeeping for a closed or replaced connection"""
+        self.prepared.pop(connection, None)
+
+    def ensure_prepared(self, cur, name: str):
+        """PREPARE the statement on the cursor's connection if it is not prepared there yet"""
+        prepared = self.prepared.setdefault(cur.connection, set())
+        if name not in prepared:
+            sql, _ = self.queries[name]
+            cur.execute(f"PREPARE {name} AS {self.to_server_placeholders(sql)}")
+            prepared.add(name)
+
+    def statement(self, name: str, params: tuple, prepare: bool = True) -> str:
+        """Get the SQL text that runs a registered query with the given parameters"""
+        if not (self.prepare and prepare):
+            return self.queries[name][0]
+        if not params:
+            return f"EXECUTE {name}"
+        return f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+
+    def execute(self, cur, name: str, sql: str, params: tuple = (), readonly: bool = False, prepare: bool = True):
+        """Run a named query on a cursor, preparing it on first use (prepare=False for server-side cursors)"""
+        self.register(name, sql, readonly)
+        if self.prepare and prepare:
+            self.ensure_prepared(cur, name)
+
+        started_at = time.perf_counter()
+        cur.execute(self.statement(name, params, prepare), params)
+        elapsed = time.perf_counter() - started_at
+
+        stats = self.stats[name]
+        stats.calls += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.last_params = params
+
+    def get_slowest(self, limit: int = 5):
+        """Get (name, stats) of the executed queries with the highest mean time"""
+        executed = [(name, stats) for name, stats in self.stats.items() if stats.calls]
+        executed.sort(key=lambda item: item[1].mean_time, reverse=True)
+        return executed[:limit]
+
+    def explain(self, cur, name: str) -> str:
+        """Get the plan of a query using its last parameters (EXPLAIN ANALYZE only for read-only queries)"""
+        _, readonly = self.queries[name]
+        params = self.stats[name].last_params
+        if self.prepare:
+            self.ensure_prepared(cur, name)
+
+        options = "(ANALYZE, BUFFERS)" if readonly else ""
+        cur.execute(f"EXPLAIN {options} {self.statement(name, params)}", params)
+        return "\n".join(row[0] for row in cur.fetchall())
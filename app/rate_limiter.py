@@ -0,0 +1,106 @@
+import asyncio
+import time
+from telegram.error import RetryAfter
+from config import Config
+
+class TokenBucket:
+    """Token bucket allowing `rate` operations per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        """Add tokens accumulated since the last update"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds to wait until a token is available (0 if one is available now)"""
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        """Take one token from the bucket"""
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        """Check if the bucket has fully refilled (i.e. it is idle)"""
+        self.refill()
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Global and per-chat rate limiting for outgoing Telegram API calls"""
+
+    # Drop idle per-chat buckets once this many are tracked
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, global_rate: float = None, per_chat_rate: float = None):
+        global_rate = global_rate or Config.TELEGRAM_GLOBAL_RATE
+        self.per_chat_rate = per_chat_rate or Config.TELEGRAM_PER_CHAT_RATE
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+        self.paused_until = 0.0
+
+    def get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Get (or create) the token bucket for a chat"""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self.chat_buckets = {
+                    key: value for key, value in self.chat_buckets.items() if not value.is_full()
+                }
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def chat_delay(self, chat_id: int) -> float:
+        """Seconds until the chat's own limit allows another call (0 if it does now)"""
+        return self.get_chat_bucket(chat_id).delay()
+
+    async def acquire(self, chat_id: int, per_chat: bool = True):
+        """Wait until the global bucket (and the chat bucket, if per_chat) allow a call"""
+        chat_bucket = self.get_chat_bucket(chat_id) if per_chat else None
+        while True:
+            wait = max(
+                self.paused_until - time.monotonic(),
+                self.global_bucket.delay(),
+                chat_bucket.delay() if chat_bucket else 0.0
+            )
+            if wait <= 0:
+                # No await between the check and consuming, so this is race-free on the event loop
+                self.global_bucket.consume()
+                if chat_bucket:
+                    chat_bucket.consume()
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop all calls for the given number of seconds (Telegram flood control)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def call(self, chat_id: int, func, /, *args, per_chat: bool = True, **kwargs):
+        """Call a bot method for a chat, honouring rate limits and retry_after responses"""
+        # chat_id and func are positional-only, so kwargs can carry the bot method's own chat_id
+        for attempt in range(Config.TELEGRAM_MAX_RETRIES + 1):
+            await self.acquire(chat_id, per_chat)
+            # Rewind file uploads so a retry sends the whole file again
+            for value in kwargs.values():
+                if hasattr(value, 'seek'):
+                    value.seek(0)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == Config.TELEGRAM_MAX_RETRIES:
+                    raise
+                retry_after = e.retry_after
+                if hasattr(retry_after, 'total_seconds'):
+                    retry_after = retry_after.total_seconds()
+                print(f"Flood control hit for chat {chat_id}, retrying in {retry_after}s")
+                self.pause(retry_after)
@@ -0,0 +1,88 @@
+import json
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from datetime import date
+from config import Config
+
+class HttpRateSource:
+    """Rate source for a currency-api style HTTP endpoint"""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url  # {version} is replaced with "latest" or a YYYY-MM-DD date
+        self.timeout = timeout
+
+    def fetch(self, version: str) -> dict:
+        """Fetch USD rates (lowercase currency code -> rate)"""
+        response = requests.get(self.url.format(version=version), timeout=self.timeout)
+        response.raise_for_status()
+        usd_rates = response.json().get('usd')
+        if not usd_rates:
+            raise ValueError("response has no USD rates")
+        return usd_rates
+
+
+class SnapshotRateSource:
+    """Rate source for the snapshot file bundled with the bot"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rates = None
+
+    def fetch(self, version: str) -> dict:
+        """Load USD rates from the snapshot (read once per process; the version is ignored)"""
+        if self.rates is None:
+            with open(self.path) as f:
+                self.rates = json.load(f)['usd']
+        return self.rates
+
+
+class RateProvider:
+    """USD rates from the first HTTP source to answer, with the bundled snapshot as a fallback"""
+
+    def __init__(self, sources: list = None, snapshot: SnapshotRateSource = None):
+        self.sources = sources or [
+            HttpRateSource(url, Config.RATE_SOURCE_TIMEOUT_SECONDS) for url in Config.RATE_SOURCE_URLS
+        ]
+        self.snapshot = snapshot or SnapshotRateSource(Config.RATE_SNAPSHOT_FILE)
+        self.pool = ThreadPoolExecutor(max_workers=len(self.sources) or 1, thread_name_prefix="rate-source")
+        self.offline_until = 0.0  # HTTP sources are skipped until then after they all failed
+
+    def fetch_first(self, version: str):
+        """Query all HTTP sources concurrently and return the first good response (None if all failed)"""
+        futures = {self.pool.submit(source.fetch, version): source for source in self.sources}
+        # The requests timeout applies per socket operation, so also bound the whole wait
+        deadline = max(source.timeout for source in self.sources) if self.sources else 0
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"Rate source {futures[future].url} failed: {e}")
+        except TimeoutError:
+            print(f"No rate source answered within {deadline}s")
+        return None
+
+    def get_usd_rates(self, target_date: date):
+        """Get (usd_rates, is_fallback) for a date; is_fallback is True when the snapshot had to be used"""
+        if time.monotonic() >= self.offline_until:
+            version = 'latest' if target_date >= date.today() else target_date.isoformat()
+            usd_rates = self.fetch_first(version)
+            if usd_rates:
+                return usd_rates, False
+            # Don't make every new transaction wait for timeouts while the sources are down
+            self.offline_until = time.monotonic() + Config.RATE_SOURCE_RETRY_SECONDS
+
+        return self.get_snapshot_rates(), True
+
+    def get_snapshot_rates(self) -> dict:
+        """Get the bundled snapshot USD rates (empty if the snapshot can't be read)"""
+        try:
+            return self.snapshot.fetch(date.today().isoformat())
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Rate snapshot {self.snapshot.path} unavailable: {e}")
+            return {}
+
+    def cleanup(self):
+        """Shut down the source fetch pool"""
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from itertools import count
+from config import Config
+from rate_limiter import RateLimiter
+
+# Telegram limit for photo captions
+MAX_CAPTION_LENGTH = 1024
+
+# Send priorities: replies to users go ahead of bulk sends such as digests
+INTERACTIVE = 0
+BULK = 1
+
+# Calls that don't count against the per-chat message limit
+UNLIMITED_METHODS = {"delete_message"}
+
+class SendQueue:
+    """Centralized outbound queue for Telegram bot calls with flood control and metrics"""
+
+    def __init__(self, rate_limiter: RateLimiter = None, workers: int = None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.worker_count = workers or Config.SEND_QUEUE_WORKERS
+        self.bot = None
+        self.pending = {}  # chat ID -> deque of queued calls, in send order
+        self.ready = None  # (priority, sequence, chat ID) of chats whose next call can be sent
+        self.sequence = count()
+        self.queued = 0
+        self.workers = []
+
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.send_latencies = deque(maxlen=1000)  # seconds spent in the API call
+        self.total_latencies = deque(maxlen=1000)  # seconds from enqueue to completion
+
+    async def start(self, bot):
+        """Start the queue workers"""
+        self.bot = bot
+        self.ready = asyncio.PriorityQueue()
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.worker_count)]
+
+    async def flush(self):
+        """Wait until every queued call has been sent"""
+        while self.pending:
+            await asyncio.sleep(0.1)
+
+    async def stop(self, timeout: float = 10):
+        """Flush pending calls (up to timeout seconds) and stop the workers"""
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Send queue stopped with {self.depth()} pending calls")
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def depth(self) -> int:
+        """Number of calls waiting to be sent"""
+        return self.queued
+
+    def schedule(self, chat_id: int, delay: float = 0):
+        """Make a chat's next call available to the workers, after `delay` seconds"""
+        priority = self.pending[chat_id][0][4]
+        item = (priority, next(self.sequence), chat_id)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.ready.put_nowait, item)
+        else:
+            self.ready.put_nowait(item)
+
+    def enqueue(self, chat_id: int, method: str, priority: int = INTERACTIVE, /, **kwargs) -> asyncio.Future:
+        """Queue a bot call for a chat; the returned future resolves to the call result"""
+        future = asyncio.get_running_loop().create_future()
+        call = (method, kwargs, future, time.monotonic(), priority)
+        calls = self.pending.get(chat_id)
+        if calls is None:
+            self.pending[chat_id] = deque([call])
+            self.schedule(chat_id)
+        else:
+            # The chat is already scheduled or being sent to; its calls go out in order
+            calls.append(call)
+        self.queued += 1
+        self.max_depth = max(self.max_depth, self.queued)
+        return future
+
+    async def worker(self):
+        """Send the next call of ready chats, highest priority first, respecting rate limits"""
+        while True:
+            _, _, chat_id = await self.ready.get()
+            calls = self.pending[chat_id]
+            method, kwargs, future, enqueued_at, _ = calls[0]
+            per_chat = method not in UNLIMITED_METHODS
+
+            # Waiting for the chat's own limit here would hold up every other chat, so come back later
+            wait = self.rate_limiter.chat_delay(chat_id) if per_chat else 0
+            if wait > 0:
+                self.schedule(chat_id, wait)
+                continue
+
+            calls.popleft()
+            self.queued -= 1
+            started_at = time.monotonic()
+            try:
+                result = await self.rate_limiter.call(chat_id, getattr(self.bot, method), per_chat=per_chat, **kwargs)
+                self.sent += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error in {method} for chat {chat_id}: {e}")
+                if not future.done():
+                    future.set_exception(e)
+                    # Already logged above, so callers may ignore the future
+                    future.add_done_callback(lambda f: f.exception())
+            finally:
+                finished_at = time.monotonic()
+                self.send_latencies.append(finished_at - started_at)
+                self.total_latencies.append(finished_at - enqueued_at)
+                if calls:
+                    self.schedule(chat_id)
+                else:
+                    del self.pending[chat_id]
+
+    def send_message(self, chat_id: int, priority: int = INTERACTIVE, **kwargs) -> asyncio.Future:
+        """Queue a send_message call"""
+        return self.enqueue(chat_id, "send_message", priority, chat_id=chat_id, **kwargs)
+
+    def send_photo(self, chat_id: int, priority: int = INTERACTIVE, **kwargs) -> asyncio.Future:
+        """Queue a send_photo call"""
+        return self.enqueue(chat_id, "send_photo", priority, chat_id=chat_id, **kwargs)
+
+    def edit_message_text(self, chat_id: int, message_id: int, priority: int = INTERACTIVE, **kwargs) -> asyncio.Future:
+        """Queue an edit_message_text call"""
+        return self.enqueue(chat_id, "edit_message_text", priority, chat_id=chat_id, message_id=message_id, **kwargs)
+
+    def reply_text(self, message, text: str, **kwargs) -> asyncio.Future:
+        """Queue a text message to the chat of `message` (queued Message.reply_text)"""
+        return self.send_message(message.chat_id, text=text, **kwargs)
+
+    def edit_text(self, message, text: str, **kwargs) -> asyncio.Future:
+        """Queue an edit of a bot message's text (queued Message.edit_text)"""
+        return self.edit_message_text(message.chat_id, message.message_id, text=text, **kwargs)
+
+    def delete_message(self, chat_id: int, message_id: int) -> asyncio.Future:
+        """Queue a delete_message call (not counted against the chat's message limit)"""
+        return self.enqueue(chat_id, "delete_message", INTERACTIVE, chat_id=chat_id, message_id=message_id)
+
+    def send_photo_with_text(self, chat_id: int, photo, text: str, priority: int = INTERACTIVE, **kwargs) -> asyncio.Future:
+        """Send a photo with text, as its caption when it fits, otherwise as a follow-up message"""
+        if len(text) <= MAX_CAPTION_LENGTH:
+            return self.send_photo(chat_id, priority, photo=photo, caption=text, **kwargs)
+        # Resolves only when both were sent, so a failed photo isn't taken as delivered
+        future = asyncio.gather(
+            self.send_photo(chat_id, priority, photo=photo, **kwargs),
+            self.send_message(chat_id, priority, text=text)
+        )
+        # Failures are already logged by the worker, so callers may ignore the future
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    @staticmethod
+    def percentile(values, percent: float) -> float:
+        """Get a percentile of a sequence of values (0 if empty)"""
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def get_stats(self) -> dict:
+        """Get queue depth and latency metrics"""
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "send_p50": self.percentile(self.send_latencies, 50),
+            "send_p95": self.percentile(self.send_latencies, 95),
+            "total_p50": self.percentile(self.total_latencies, 50),
+            "total_p95": self.percentile(self.total_latencies, 95),
+        }
@@ -0,0 +1,23 @@
+def prepare_summary(category_totals: list):
+    """Split summary rows (category_name, total_amount, currency) into chart data"""
+    categories = []
+    amounts = []
+    currency = category_totals[0][2] if category_totals else "USD"
+
+    for category_name, total_amount, curr in category_totals:
+        if category_name:  # Only include categorized transactions
+            categories.append(category_name)
+            amounts.append(float(total_amount))
+
+    return categories, amounts, currency
+
+def format_summary_text(categories: list, amounts: list, currency: str, period_title: str) -> str:
+    """Build the text spending summary shown next to the chart"""
+    total = sum(amounts)
+    summary_lines = [f"📊 **Spending Summary - {period_title}:**"]
+    for i, (category, amount) in enumerate(zip(categories, amounts), 1):
+        percentage = (amount / total) * 100
+        summary_lines.append(f"{i}. {category}: {amount:.2f} {currency} ({percentage:.1f}%)")
+
+    summary_lines.append(f"\n💰 **Total Spent**: {total:.2f} {currency}")
+    return "\n".join(summary_lines)
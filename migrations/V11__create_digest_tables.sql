@@ -0,0 +1,32 @@
+-- Opt-in periodic spending digests
+ALTER TABLE users
+ADD COLUMN digest_frequency VARCHAR(10);
+
+ALTER TABLE users
+ADD CONSTRAINT users_digest_frequency_check CHECK (digest_frequency IN ('weekly', 'monthly'));
+
+CREATE INDEX idx_users_digest_frequency ON users(digest_frequency) WHERE digest_frequency IS NOT NULL;
+
+-- One row per digest fan-out, so an interrupted run can be resumed after a restart
+CREATE TABLE digest_runs (
+    id BIGSERIAL PRIMARY KEY,
+    frequency VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    CONSTRAINT unique_digest_run UNIQUE (frequency, period_start)
+);
+
+-- Users already handled within a run
+CREATE TABLE digest_deliveries (
+    run_id BIGINT NOT NULL REFERENCES digest_runs(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    status VARCHAR(10) NOT NULL,
+    delivered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, user_id)
+);
+
+COMMENT ON COLUMN users.digest_frequency IS 'Periodic digest subscription: weekly, monthly or NULL (disabled)';
+COMMENT ON TABLE digest_runs IS 'Digest fan-out runs; finished_at is NULL while a run is in progress';
+COMMENT ON TABLE digest_deliveries IS 'Per-user digest delivery status within a run: sent, empty, blocked or retry';
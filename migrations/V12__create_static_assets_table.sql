@@ -0,0 +1,10 @@
+CREATE TABLE static_assets (
+    content_hash CHAR(64) PRIMARY KEY,
+    asset_path TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE static_assets IS 'Telegram file_id of uploaded static assets, so each asset is uploaded only once';
+COMMENT ON COLUMN static_assets.content_hash IS 'SHA-256 of the asset file; a changed file gets a new row and is uploaded again';
+COMMENT ON COLUMN static_assets.file_id IS 'Telegram file_id returned by the first upload (specific to the bot token)';
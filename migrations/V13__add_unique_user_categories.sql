@@ -0,0 +1,32 @@
+-- Merge duplicate categories (same user and name) into the oldest one before adding the unique constraint
+UPDATE transactions t
+SET category_id = d.keep_id
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY user_id, category_name) AS keep_id
+    FROM categories
+) d
+WHERE t.category_id = d.id AND d.id <> d.keep_id;
+
+DELETE FROM categories c
+USING categories k
+WHERE c.user_id = k.user_id
+  AND c.category_name = k.category_name
+  AND c.id > k.id;
+
+ALTER TABLE categories
+ADD CONSTRAINT unique_user_category UNIQUE (user_id, category_name);
+
+-- Archived categories are hidden from selection but keep their transactions
+ALTER TABLE categories
+ADD COLUMN archived_at TIMESTAMP;
+
+-- Lets /start skip category setup for users who were already onboarded
+ALTER TABLE users
+ADD COLUMN categories_initialized BOOLEAN NOT NULL DEFAULT FALSE;
+
+UPDATE users u
+SET categories_initialized = TRUE
+WHERE EXISTS (SELECT 1 FROM categories c WHERE c.user_id = u.user_id);
+
+COMMENT ON COLUMN categories.archived_at IS 'When the user archived the category (NULL = active)';
+COMMENT ON COLUMN users.categories_initialized IS 'Whether default categories were created for the user';
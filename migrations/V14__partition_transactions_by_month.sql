@@ -0,0 +1,97 @@
+-- Convert transactions into a table range-partitioned by month of timestamp.
+-- Existing rows are copied into the new table, which then takes over the name.
+-- Takes an exclusive lock on transactions for the duration of the copy.
+
+ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+
+-- The partition key must not be NULL
+UPDATE transactions_unpartitioned
+SET timestamp = CURRENT_TIMESTAMP
+WHERE timestamp IS NULL;
+
+CREATE TABLE transactions (
+    transaction_id BIGINT NOT NULL DEFAULT nextval('transactions_transaction_id_seq'),
+    user_id BIGINT NOT NULL,
+    amount NUMERIC NOT NULL,
+    currency TEXT NOT NULL,
+    message TEXT,
+    category_id BIGINT REFERENCES categories(id),
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    default_currency_amount DECIMAL(10,2),
+    -- Unique constraints on a partitioned table must include the partition key
+    PRIMARY KEY (transaction_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Keep the existing ID sequence, now owned by the new table
+ALTER SEQUENCE transactions_transaction_id_seq OWNED BY transactions.transaction_id;
+
+-- Created on every partition
+CREATE INDEX idx_transactions_user_timestamp ON transactions(user_id, timestamp);
+
+-- Create the monthly partition containing month_start (if missing) and return its name
+CREATE OR REPLACE FUNCTION create_transactions_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    partition_start DATE := date_trunc('month', month_start)::date;
+    partition_name TEXT := 'transactions_' || to_char(partition_start, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        partition_start,
+        (partition_start + INTERVAL '1 month')::date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure partitions exist for the current month and the next months_ahead months
+CREATE OR REPLACE FUNCTION ensure_transactions_partitions(months_ahead INTEGER) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    created INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_DATE),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        IF to_regclass('transactions_' || to_char(month_start, 'YYYY_MM')) IS NULL THEN
+            PERFORM create_transactions_partition(month_start);
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for all existing data plus the upcoming months
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(timestamp) FROM transactions_unpartitioned), CURRENT_DATE)),
+            date_trunc('month', CURRENT_DATE),
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        PERFORM create_transactions_partition(month_start);
+    END LOOP;
+END;
+$$;
+
+SELECT ensure_transactions_partitions(3);
+
+INSERT INTO transactions (transaction_id, user_id, amount, currency, message, category_id, timestamp, default_currency_amount)
+SELECT transaction_id, user_id, amount, currency, message, category_id, timestamp, default_currency_amount
+FROM transactions_unpartitioned;
+
+DROP TABLE transactions_unpartitioned;
+
+COMMENT ON TABLE transactions IS 'Transactions, range-partitioned by month of timestamp (partitions named transactions_YYYY_MM)';
+COMMENT ON COLUMN transactions.user_id IS 'Telegram user ID (BIGINT) - consistent across all tables';
+COMMENT ON COLUMN transactions.default_currency_amount IS 'Amount converted to user''s default currency for consistent reporting';
+COMMENT ON FUNCTION ensure_transactions_partitions(INTEGER) IS 'Creates missing monthly partitions up to months_ahead months from now; run daily by the bot';
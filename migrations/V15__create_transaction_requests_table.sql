@@ -0,0 +1,12 @@
+-- One row per transaction-creating request (the category selection message),
+-- so a repeated or redelivered callback cannot create a second transaction
+CREATE TABLE transaction_requests (
+    request_key TEXT PRIMARY KEY,
+    transaction_id BIGINT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_transaction_requests_created_at ON transaction_requests(created_at);
+
+COMMENT ON TABLE transaction_requests IS 'Idempotency keys for transaction creation; old rows are pruned daily by the bot';
+COMMENT ON COLUMN transaction_requests.request_key IS 'chat_id:message_id of the category selection message';
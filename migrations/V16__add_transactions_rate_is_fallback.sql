@@ -0,0 +1,9 @@
+-- Transactions converted with the bundled snapshot rates (no rate source reachable)
+-- are re-converted by the bot once real rates for their date are cached
+ALTER TABLE transactions
+ADD COLUMN rate_is_fallback BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Created on every partition; stays tiny because few rows are ever flagged
+CREATE INDEX idx_transactions_rate_is_fallback ON transactions(timestamp) WHERE rate_is_fallback;
+
+COMMENT ON COLUMN transactions.rate_is_fallback IS 'default_currency_amount was computed from snapshot rates and is pending re-conversion';
@@ -0,0 +1,85 @@
+#!/bin/bash
+
+# Transactions Archival Script for MemMoney Bot
+# Dumps monthly transactions partitions older than the retention period to compressed files,
+# then detaches and drops them from the Supabase database.
+#
+# Usage: scripts/archive-partitions.sh [KEEP_MONTHS]   (default: 24)
+
+set -e
+set -o pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
+ARCHIVE_DIR="$PROJECT_DIR/backups/archive"
+KEEP_MONTHS="${1:-24}"
+
+# Load environment variables
+if [ -f "$PROJECT_DIR/.env" ]; then
+    export $(grep -v '^#' "$PROJECT_DIR/.env" | grep -E '(SUPABASE_|POSTGRES_)' | xargs)
+else
+    echo "❌ Error: .env file not found"
+    exit 1
+fi
+
+# Check if required variables are set
+if [ -z "$SUPABASE_HOST" ] || [ -z "$SUPABASE_PASSWORD" ]; then
+    echo "❌ Error: SUPABASE_HOST and SUPABASE_PASSWORD must be set in .env"
+    exit 1
+fi
+
+export PGPASSWORD=$SUPABASE_PASSWORD
+PSQL="psql -h $SUPABASE_HOST -p 5432 -U $SUPABASE_USER -d $SUPABASE_DB -v ON_ERROR_STOP=1 -At"
+
+mkdir -p "$ARCHIVE_DIR"
+
+# Partitions are named transactions_YYYY_MM, so names sort by month
+CUTOFF=$($PSQL -c "SELECT 'transactions_' || to_char(date_trunc('month', CURRENT_DATE) - make_interval(months => $KEEP_MONTHS), 'YYYY_MM')")
+
+echo "🗄️  Archiving transactions partitions older than $KEEP_MONTHS months (before $CUTOFF)..."
+
+PARTITIONS=$($PSQL -c "
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = 'transactions' AND c.relname < '$CUTOFF'
+    ORDER BY c.relname")
+
+if [ -z "$PARTITIONS" ]; then
+    echo "✅ Nothing to archive"
+    exit 0
+fi
+
+for PARTITION in $PARTITIONS; do
+    ARCHIVE_FILE="$ARCHIVE_DIR/$PARTITION.sql.gz"
+    echo "💾 Dumping $PARTITION..."
+
+    pg_dump \
+      -h "$SUPABASE_HOST" \
+      -p 5432 \
+      -U "$SUPABASE_USER" \
+      -d "$SUPABASE_DB" \
+      --no-owner \
+      --no-privileges \
+      -t "public.$PARTITION" \
+      -F p | gzip > "$ARCHIVE_FILE.tmp"
+
+    # Only remove the partition once the archive is known to be readable
+    gzip -t "$ARCHIVE_FILE.tmp"
+    mv "$ARCHIVE_FILE.tmp" "$ARCHIVE_FILE"
+
+    echo "✂️  Detaching and dropping $PARTITION..."
+    $PSQL -c "
+        BEGIN;
+        ALTER TABLE transactions DETACH PARTITION $PARTITION;
+        DROP TABLE $PARTITION;
+        COMMIT;"
+
+    # Already archived, so the incremental backup no longer needs it
+    rm -f "$PROJECT_DIR/backups/partitions/$PARTITION.sql.gz" "$PROJECT_DIR/backups/partitions/$PARTITION.md5"
+
+    echo "📁 Archived to: $ARCHIVE_FILE ($(du -h "$ARCHIVE_FILE" | cut -f1))"
+done
+
+echo "✅ Archival complete!"
@@ -1,13 +1,17 @@
 #!/bin/bash
 
 # Supabase Backup Script for MemMoney Bot
-# Creates a timestamped backup of the Supabase database
+# Creates a timestamped backup of the schema and all tables except transactions data,
+# plus incremental per-partition backups of transactions: a monthly partition is only
+# dumped again when its contents changed since the last backup.
 
 set -e
+set -o pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
 BACKUP_DIR="$PROJECT_DIR/backups"
+PARTITIONS_DIR="$BACKUP_DIR/partitions"
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
 BACKUP_FILE="$BACKUP_DIR/supabase_backup_$TIMESTAMP.sql"
 
@@ -25,21 +29,25 @@ if [ -z "$SUPABASE_HOST" ] || [ -z "$SUPABASE_PASSWORD" ]; then
     exit 1
 fi
 
-# Create backup directory
-mkdir -p "$BACKUP_DIR"
+# Create backup directories
+mkdir -p "$BACKUP_DIR" "$PARTITIONS_DIR"
+
+export PGPASSWORD=$SUPABASE_PASSWORD
+PSQL="psql -h $SUPABASE_HOST -p 5432 -U $SUPABASE_USER -d $SUPABASE_DB -v ON_ERROR_STOP=1 -At"
 
 echo "💾 Creating Supabase backup..."
 echo "📅 Timestamp: $TIMESTAMP"
 echo "🔗 Host: $SUPABASE_HOST"
 
-# Create backup using pg_dump (use port 5432 for direct connection)
-PGPASSWORD=$SUPABASE_PASSWORD pg_dump \
+# Schema and all data except transactions partitions (use port 5432 for direct connection)
+pg_dump \
   -h "$SUPABASE_HOST" \
   -p 5432 \
   -U "$SUPABASE_USER" \
   -d "$SUPABASE_DB" \
   --no-owner \
   --no-privileges \
+  --exclude-table-data='public.transactions_*' \
   -F p \
   -f "$BACKUP_FILE"
 
@@ -50,12 +58,49 @@ gzip "$BACKUP_FILE"
 BACKUP_FILE_GZ="${BACKUP_FILE}.gz"
 BACKUP_SIZE=$(du -h "$BACKUP_FILE_GZ" | cut -f1)
 
-echo "✅ Backup complete!"
-echo "📁 File: $BACKUP_FILE_GZ"
-echo "📦 Size: $BACKUP_SIZE"
+echo "📁 Base backup: $BACKUP_FILE_GZ ($BACKUP_SIZE)"
+
+# Incremental backup of transactions partitions
+echo "🧩 Backing up changed transactions partitions..."
+PARTITIONS=$($PSQL -c "
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = 'transactions'
+    ORDER BY c.relname")
+
+DUMPED_COUNT=0
+for PARTITION in $PARTITIONS; do
+    PARTITION_FILE="$PARTITIONS_DIR/$PARTITION.sql.gz"
+    CHECKSUM_FILE="$PARTITIONS_DIR/$PARTITION.md5"
+
+    CHECKSUM=$($PSQL -c "SELECT md5(COALESCE(string_agg(t::text, ',' ORDER BY t.transaction_id), '')) FROM $PARTITION t")
+    if [ -f "$PARTITION_FILE" ] && [ "$(cat "$CHECKSUM_FILE" 2>/dev/null)" = "$CHECKSUM" ]; then
+        continue
+    fi
+
+    pg_dump \
+      -h "$SUPABASE_HOST" \
+      -p 5432 \
+      -U "$SUPABASE_USER" \
+      -d "$SUPABASE_DB" \
+      --no-owner \
+      --no-privileges \
+      --data-only \
+      -t "public.$PARTITION" \
+      -F p | gzip > "$PARTITION_FILE.tmp"
+    mv "$PARTITION_FILE.tmp" "$PARTITION_FILE"
+    echo "$CHECKSUM" > "$CHECKSUM_FILE"
+
+    echo "  📦 $PARTITION ($(du -h "$PARTITION_FILE" | cut -f1))"
+    DUMPED_COUNT=$((DUMPED_COUNT + 1))
+done
+
+echo "✅ Backup complete! ($DUMPED_COUNT changed partitions)"
 
-# Clean up old backups (keep last 7 days)
+# Clean up old base backups (keep last 7 days); partition backups always hold the latest contents
 echo "🧹 Cleaning up old backups (keeping last 7 days)..."
-find "$BACKUP_DIR" -name "supabase_backup_*.sql.gz" -mtime +7 -delete
-REMAINING_COUNT=$(find "$BACKUP_DIR" -name "supabase_backup_*.sql.gz" | wc -l | tr -d ' ')
-echo "📊 Total backups: $REMAINING_COUNT"
\ No newline at end of file
+find "$BACKUP_DIR" -maxdepth 1 -name "supabase_backup_*.sql.gz" -mtime +7 -delete
+REMAINING_COUNT=$(find "$BACKUP_DIR" -maxdepth 1 -name "supabase_backup_*.sql.gz" | wc -l | tr -d ' ')
+echo "📊 Total backups: $REMAINING_COUNT"
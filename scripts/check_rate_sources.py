@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Rate source failover check for MemMoney Bot.
+
+Starts local stand-in HTTP servers (good, slow, failing with 500, malformed) and checks
+that the rate provider takes the first good response, holds the per-source timeout (also
+against a source that trickles its response) and falls back to the bundled snapshot when no source answers.
+
+Usage: python3 scripts/check_rate_sources.py
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from config import Config
+from rates import HttpRateSource, RateProvider, SnapshotRateSource
+
+TIMEOUT_SECONDS = 0.5
+SLOW_SECONDS = 3
+
+def start_server(status: int, body: bytes, delay: float = 0, trickle: float = 0) -> str:
+    """Start a stand-in rate source and return its URL template; trickle sends the body a byte at a time"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not trickle:
+                    self.wfile.write(body)
+                    return
+                for i in range(len(body)):
+                    time.sleep(trickle)
+                    self.wfile.write(body[i:i + 1])
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The provider stopped waiting for this source
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/{{version}}/usd.json"
+
+def get_usd_rates(*urls):
+    """Fetch today's rates from the given sources with a fresh provider; returns (rates, is_fallback, seconds)"""
+    snapshot = SnapshotRateSource(os.path.join(APP_DIR, Config.RATE_SNAPSHOT_FILE))
+    provider = RateProvider([HttpRateSource(url, TIMEOUT_SECONDS) for url in urls], snapshot)
+    started_at = time.monotonic()
+    usd_rates, is_fallback = provider.get_usd_rates(date.today())
+    elapsed = time.monotonic() - started_at
+    provider.cleanup()
+    return usd_rates, is_fallback, elapsed
+
+def check(name: str, passed: bool) -> bool:
+    print(f"{'✅' if passed else '❌'} {name}")
+    return passed
+
+def main():
+    good = start_server(200, json.dumps({"usd": {"eur": 0.9, "usd": 1}}).encode())
+    slow = start_server(200, json.dumps({"usd": {"eur": 0.5, "usd": 1}}).encode(), delay=SLOW_SECONDS)
+    # Each byte arrives within the socket timeout, but the whole response takes far longer
+    trickling = start_server(200, json.dumps({"usd": {"eur": 0.5, "usd": 1}}).encode(), trickle=TIMEOUT_SECONDS / 5)
+    failing = start_server(500, b'{}')
+    malformed = start_server(200, b'<html>not rates</html>')
+
+    print("🧪 Checking rate sources against local stand-in servers...")
+    results = []
+
+    usd_rates, is_fallback, elapsed = get_usd_rates(slow, failing, good)
+    results.append(check(
+        f"First good response wins ({elapsed:.2f}s)",
+        usd_rates.get('eur') == 0.9 and not is_fallback and elapsed < TIMEOUT_SECONDS
+    ))
+
+    usd_rates, is_fallback, elapsed = get_usd_rates(slow)
+    results.append(check(
+        f"Per-source timeout holds ({elapsed:.2f}s, timeout {TIMEOUT_SECONDS}s)",
+        is_fallback and elapsed < SLOW_SECONDS
+    ))
+
+    usd_rates, is_fallback, elapsed = get_usd_rates(trickling)
+    results.append(check(
+        f"Overall timeout holds against a trickling source ({elapsed:.2f}s, timeout {TIMEOUT_SECONDS}s)",
+        is_fallback and elapsed < SLOW_SECONDS
+    ))
+
+    usd_rates, is_fallback, _ = get_usd_rates(failing, malformed)
+    results.append(check(
+        "Falls back to the snapshot when no source answers",
+        is_fallback and usd_rates.get('usd') == 1.0 and 'eur' in usd_rates
+    ))
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Memory soak test for MemMoney Bot summaries.
+
+Renders thousands of synthetic spending summaries through the same path as the bot
+(memory governor + chart generator + summary text) and fails if RSS keeps growing
+after warm-up.
+
+Usage: python3 scripts/soak_summaries.py [ITERATIONS] [MAX_GROWTH_MB]
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from chart_generator import ChartGenerator
+from config import Config
+from memory import MemoryGovernor
+from summary import format_summary_text
+
+WARMUP_ITERATIONS = 50
+
+async def soak(iterations: int, max_growth_mb: float) -> bool:
+    governor = MemoryGovernor()
+    chart_generator = ChartGenerator()
+    random.seed(42)
+
+    async def render_one(i: int):
+        categories = random.sample(Config.DEFAULT_CATEGORIES, random.randint(1, len(Config.DEFAULT_CATEGORIES)))
+        amounts = [round(random.uniform(1, 500), 2) for _ in categories]
+        chart_buffer = await governor.render_chart(chart_generator, categories, amounts, "USD", f"Soak {i}")
+        format_summary_text(categories, amounts, "USD", f"Soak {i}")
+        chart_buffer.close()
+
+    baseline = None
+    peak = 0
+    batch = Config.CHART_RENDER_WORKERS * 2
+    for start in range(0, iterations, batch):
+        await asyncio.gather(*(render_one(i) for i in range(start, min(start + batch, iterations))))
+
+        rss = governor.get_rss() / 1024 / 1024
+        if baseline is None and start + batch >= WARMUP_ITERATIONS:
+            baseline = rss
+        peak = max(peak, rss)
+        if (start // batch) % 50 == 0:
+            print(f"  {start + batch:>6} summaries, RSS {rss:.1f} MB")
+
+    governor.cleanup()
+    # Concurrent renders spike RSS briefly, so growth is judged on where RSS ends up, not on the peak
+    growth = rss - baseline
+    print(f"📊 Baseline {baseline:.1f} MB, peak {peak:.1f} MB, final {rss:.1f} MB, growth {growth:.1f} MB (limit {max_growth_mb} MB)")
+    return growth <= max_growth_mb
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_growth_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    # The baseline is taken after warm-up, so there must be summaries left to measure
+    if iterations <= WARMUP_ITERATIONS:
+        print(f"❌ ITERATIONS must be greater than the {WARMUP_ITERATIONS} warm-up summaries")
+        sys.exit(2)
+
+    print(f"🧪 Rendering {iterations} synthetic summaries...")
+    if asyncio.run(soak(iterations, max_growth_mb)):
+        print("✅ RSS stayed flat")
+    else:
+        print("❌ RSS kept growing")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()